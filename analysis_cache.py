@@ -0,0 +1,148 @@
+# analysis_cache.py
+"""Persistent, content-addressed cache for per-constant analysis results
+
+Entries are keyed by a BLAKE2b hash of the constant's bytes plus a namespace
+(the analyzer version) and the minimum string length, so the same runtime or
+library constant is only extracted once across every .bin file analysed.
+The store is a single SQLite file; when it grows past max_bytes the least
+recently used entries are evicted.
+
+Several processes share one file, so no write transaction is ever left
+open: each put commits at once, and lookups never write. Recency updates
+from get() are kept in memory and written with the next put or commit().
+A database error (e.g. the file staying locked past the timeout) makes a
+lookup a miss and drops a write; it never aborts the analysis.
+"""
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    digest BLOB NOT NULL,
+    namespace TEXT NOT NULL,
+    min_length INTEGER NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (digest, namespace, min_length)
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+'''
+
+def constant_digest(data):
+    """Return the content hash used as cache key for a constant"""
+    return hashlib.blake2b(data, digest_size=20).digest()
+
+class AnalysisCache:
+    """SQLite-backed LRU cache of extraction results for constants
+
+    Values are whatever JSON-serialisable object the caller stores (the
+    analyzer stores hits and binary analysis). Constants smaller than
+    min_size bytes are not cached: extracting them is cheaper than a lookup.
+    """
+
+    def __init__(self, path, namespace='', max_bytes=256 * 1024 * 1024, min_size=256):
+        self.path = path
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.min_size = min_size
+        self.hits = 0
+        self.misses = 0
+        self._touched = {}  # Key -> time of the last hit, not written yet
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def cacheable(self, data):
+        """True if data is large enough to be worth caching"""
+        return len(data) >= self.min_size
+
+    def get(self, data, min_length):
+        """Return the cached value for data, or None on a miss"""
+        if not self.cacheable(data):
+            return None
+        key = (constant_digest(data), self.namespace, min_length)
+        try:
+            row = self._conn.execute(
+                'SELECT value FROM entries WHERE digest = ? AND namespace = ? AND min_length = ?', key
+            ).fetchone()
+        except sqlite3.Error:
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched[key] = time.time()
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def put(self, data, min_length, value):
+        """Store value for data, evicting old entries if over max_bytes"""
+        if not self.cacheable(data):
+            return
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'), 1)
+        try:
+            with self._conn:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO entries (digest, namespace, min_length, value, size, last_used) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (constant_digest(data), self.namespace, min_length, blob, len(blob), time.time()))
+                self._write_touched()
+                self._total += len(blob)
+                if self._total > self.max_bytes:
+                    self._evict()
+        except sqlite3.Error:
+            pass  # Only a cache: the value is recomputed next time
+
+    def _write_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                'UPDATE entries SET last_used = ? WHERE digest = ? AND namespace = ? AND min_length = ?',
+                [(used,) + key for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def commit(self):
+        """Write the recency of entries hit since the last write"""
+        if not self._touched:
+            return
+        try:
+            with self._conn:
+                self._write_touched()
+        except sqlite3.Error:
+            self._touched.clear()  # Recency is only a hint for eviction
+
+    def _evict(self):
+        """Drop least recently used entries until the store is at 90% of max_bytes"""
+        # Other processes may share the file, so recount before deleting
+        self._total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        excess = self._total - int(self.max_bytes * 0.9)
+        if excess <= 0:
+            return
+        victims = []
+        rows = self._conn.execute(
+            'SELECT digest, namespace, min_length, size FROM entries ORDER BY last_used')
+        for digest, namespace, min_length, size in rows:
+            victims.append((digest, namespace, min_length))
+            excess -= size
+            self._total -= size
+            if excess <= 0:
+                break
+        self._conn.executemany(
+            'DELETE FROM entries WHERE digest = ? AND namespace = ? AND min_length = ?', victims)
+
+    def close(self):
+        """Write pending recency updates and close the database"""
+        if self._conn is not None:
+            self.commit()
+            self._conn.close()
+            self._conn = None
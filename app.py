@@ -1,7 +1,382 @@
 # nw_bin_decompiler.py
 import sys
+import os
+import glob
+import json
+import argparse
 import struct
 import re
+import binascii
+import hashlib
+import heapq
+import mmap
+import sqlite3
+from array import array
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice, repeat
+from math import gcd, log2
+from operator import attrgetter, methodcaller
+
+# One printable UTF-8 character: printable ASCII (plus tab/newline/CR) or a
+# well-formed multi-byte sequence. C0/C1 controls and DEL are excluded so a
+# run always stops at them.
+_UTF8_CHAR = (
+    b'[\x20-\x7e\t\n\r]'
+    b'|\xc2[\xa0-\xbf]|[\xc3-\xdf][\x80-\xbf]'
+    b'|\xe0[\xa0-\xbf][\x80-\xbf]|[\xe1-\xec\xee\xef][\x80-\xbf]{2}'
+    b'|\xed[\x80-\x9f][\x80-\xbf]'
+    b'|\xf0[\x90-\xbf][\x80-\xbf]{2}|[\xf1-\xf3][\x80-\xbf]{3}'
+    b'|\xf4[\x80-\x8f][\x80-\xbf]{2}'
+)
+_TEXT_WHITESPACE = str.maketrans('', '', '\t\n\r')
+
+# Byte class accepted inside a length-prefixed string (printable ASCII plus
+# tab/newline/CR), and little-endian readers for the multi-byte prefixes.
+_TEXT_BYTE = b'[\x20-\x7e\t\n\r]'
+_PREFIX_STRUCTS = {2: struct.Struct('<H'), 4: struct.Struct('<I')}
+MAX_PREFIXED_LENGTH = 500
+
+# Decoded base64/hex payloads made only of printable ASCII or UTF-8
+_PRINTABLE_ASCII = re.compile(_TEXT_BYTE + b'*')
+_PRINTABLE_UTF8 = re.compile(b'(?:' + _UTF8_CHAR + b')*')
+
+# Bytes that never occur inside a text run (C0 controls other than tab/LF/CR,
+# DEL, and bytes that are invalid anywhere in UTF-8). Large constants are only
+# cut at these, so parallel chunks never split a string.
+_SPLIT_BYTE_PATTERN = re.compile(b'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f\xc0\xc1\xf5-\xff]')
+PARALLEL_CHUNK_SIZE = 1 << 20
+
+# Sliding-window entropy defaults; windows at or above HIGH_ENTROPY bits/byte
+# look compressed or encrypted
+ENTROPY_WINDOW = 4096
+HIGH_ENTROPY = 7.2
+
+# memoryview formats that pack an n-gram into one native integer
+_NGRAM_FORMATS = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+NgramCount = namedtuple('NgramCount', ['gram', 'count', 'error'])
+
+# Detector kinds reported by scan_strings, in the order they run on a text run
+DETECTORS = ('null_terminated', 'ascii', 'length_prefixed', 'utf8', 'base64', 'hex')
+_DETECTOR_PREFIXES = {'base64': 'base64:', 'hex': 'hex:'}
+# A maximal run of base64 characters whose first character can encode the
+# start of printable UTF-8 (tab/LF/CR, printable ASCII or a lead byte
+# 0xC2-0xF4); runs starting with any other character never decode to text
+_BASE64_PATTERN = re.compile(b'(?<![A-Za-z0-9+/])[CDI-Za-fw-z0-9][A-Za-z0-9+/]{7,}={0,2}')
+_hit_offset = attrgetter('offset')
+_match_span = methodcaller('span')
+
+StringHit = namedtuple('StringHit', ['offset', 'detector', 'text'])
+
+_PATTERN_CACHE = {}
+
+def _compiled(kind, min_length):
+    """Return a compiled detector regex for the given minimum length"""
+    key = (kind, min_length)
+    pattern = _PATTERN_CACHE.get(key)
+    if pattern is None:
+        count = str(max(min_length, 1)).encode()
+        if kind == 'utf8':
+            source = b'(?:' + _UTF8_CHAR + b'){' + count + b',}'
+        elif kind == 'text':
+            source = _TEXT_BYTE + b'{' + count + b',}'
+        elif kind == 'ascii':
+            source = b'[\x20-\x7e]{' + count + b',}'
+        else:  # hex
+            source = b'[0-9a-fA-F]{' + str(max(min_length, 1) * 2).encode() + b',}'
+        pattern = _PATTERN_CACHE[key] = re.compile(source)
+    return pattern
+
+def _is_printable_text(text):
+    """True if every character is printable or a tab/newline/CR"""
+    return text.isprintable() or text.translate(_TEXT_WHITESPACE).isprintable()
+
+def _split_printable(text):
+    """Split decoded text into (char_offset, piece) runs of printable characters"""
+    if _is_printable_text(text):
+        yield 0, text
+        return
+    start = 0
+    for i, c in enumerate(text):
+        if not (c.isprintable() or c in '\t\n\r'):
+            if i > start:
+                yield start, text[start:i]
+            start = i + 1
+    if start < len(text):
+        yield start, text[start:]
+
+def _utf8_pieces(view, start, end, min_length):
+    """Yield (offset, string) for the printable pieces of one UTF-8 run"""
+    decoded = str(view[start:end], 'utf-8')
+    for char_offset, piece in _split_printable(decoded):
+        if len(piece) >= min_length:
+            if char_offset:
+                yield start + len(decoded[:char_offset].encode('utf-8')), piece
+            else:
+                yield start, piece
+
+def _prefixed_in_run(view, start, end, min_length, prefix_sizes):
+    """Yield (offset, prefix_size, string) for prefixed strings inside one text run
+
+    Lengths of 2 and 4 bytes are at most 500, which makes their high bytes
+    non-printable: those prefixes can only sit right before the run. A 1-byte
+    prefix may be the byte before the run or any byte inside it.
+    """
+    min_length = max(min_length, 1)
+    for prefix_size in prefix_sizes:
+        if prefix_size == 1:
+            first = max(start - 1, 0)
+            last = min(end - 1 - min_length, len(view) - 2)
+            if last >= start:
+                # An in-run prefix needs at least its own value of bytes after it
+                last = max(min(last, end - 1 - min(view[start:last + 1])), first)
+            for i, length in enumerate(view[first:last + 1], first):
+                if min_length <= length <= end - i - 1:
+                    yield i + 1, 1, str(view[i + 1:i + 1 + length], 'ascii')
+        elif start >= prefix_size:
+            length = _PREFIX_STRUCTS[prefix_size].unpack_from(view, start - prefix_size)[0]
+            if min_length <= length <= min(end - start, MAX_PREFIXED_LENGTH):
+                yield start, prefix_size, str(view[start:start + length], 'ascii')
+
+def scan_utf8_runs(data, min_length=3):
+    """Yield (offset, string) for every maximal printable UTF-8 run in data"""
+    view = memoryview(data)
+    for match in _compiled('utf8', min_length).finditer(view):
+        yield from _utf8_pieces(view, match.start(), match.end(), min_length)
+
+def scan_length_prefixed(data, min_length=3, prefix_sizes=(1, 2, 4)):
+    """Yield (offset, prefix_size, string) for length-prefixed printable strings
+
+    A candidate string must lie entirely inside one printable run, so the
+    printable runs are indexed once and only prefixes that can reach into a
+    run are read.
+    """
+    view = memoryview(data)
+    runs = [match.span() for match in _compiled('text', min_length).finditer(view)]
+    for prefix_size in prefix_sizes:
+        for start, end in runs:
+            yield from _prefixed_in_run(view, start, end, min_length, (prefix_size,))
+
+def _payload_text(decoded, min_length):
+    """Return decoded bytes as printable text of min_length characters, or None
+
+    The byte patterns reject binary payloads at their first bad byte,
+    without decoding or raising; plain ASCII text needs no further checks.
+    """
+    if len(decoded) < min_length:
+        return None
+    if _PRINTABLE_ASCII.fullmatch(decoded):
+        return str(decoded, 'ascii')
+    if _PRINTABLE_UTF8.fullmatch(decoded) is None:
+        return None
+    text = str(decoded, 'utf-8')
+    if len(text) >= min_length and _is_printable_text(text):
+        return text
+    return None
+
+def _batch_hits(detector, candidates, decode, min_length):
+    """Return StringHits for (offset, encoded, decoded size) candidates
+
+    The candidates are decoded with a single decode call on their
+    concatenation, then split at the decoded sizes.
+    """
+    if len(candidates) == 1:
+        offset, encoded, _ = candidates[0]
+        text = _payload_text(decode(encoded), min_length)
+        return [StringHit(offset, detector, text)] if text is not None else []
+    decoded = decode(b''.join([encoded for _, encoded, _ in candidates]))
+    hits = []
+    position = 0
+    for offset, _, size in candidates:
+        text = _payload_text(decoded[position:position + size], min_length)
+        if text is not None:
+            hits.append(StringHit(offset, detector, text))
+        position += size
+    return hits
+
+def _ascii_hits(view, start, end, min_length):
+    """Printable ASCII, tagged by whether a NUL terminator follows"""
+    size = len(view)
+    for match in _compiled('ascii', min_length).finditer(view, start, end):
+        s, e = match.span()
+        detector = 'null_terminated' if e < size and view[e] == 0 else 'ascii'
+        yield StringHit(s, detector, str(view[s:e], 'ascii'))
+
+def _prefixed_hits(view, start, end, min_length):
+    """Length-prefixed strings inside the 7-bit text parts of a run"""
+    for match in _compiled('text', min_length).finditer(view, start, end):
+        for offset, _, text in _prefixed_in_run(view, match.start(), match.end(), min_length, (1, 2, 4)):
+            yield StringHit(offset, 'length_prefixed', text)
+
+def _utf8_hits(view, start, end, min_length):
+    """The run itself as UTF-8 text"""
+    for offset, text in _utf8_pieces(view, start, end, min_length):
+        yield StringHit(offset, 'utf8', text)
+
+def _base64_hits(view, start, end, min_length):
+    """Return base64 payloads in view[start:end] that decode to printable text
+
+    Candidates are screened before decoding: the pattern only matches runs
+    whose first character can start text, the characters must form whole
+    4-character groups (or be completed by the padding), and the payload
+    must hold at least min_length bytes. Unpadded groups are decoded
+    together in one binascii call; a completed partial group ends the
+    decode, so those candidates are decoded on their own.
+    """
+    candidates = []
+    hits = None
+    for match in _BASE64_PATTERN.finditer(view, start, end):
+        s, e = match.span()
+        data_end = e - (view[e - 1] == 0x3d) - (view[e - 2] == 0x3d)  # Strip '='
+        size = data_end - s
+        if size * 3 // 4 < min_length:
+            continue
+        rest = size % 4
+        if not rest:
+            candidates.append((s, view[s:data_end], size // 4 * 3))
+        elif e - data_end >= 4 - rest:
+            text = _payload_text(binascii.a2b_base64(view[s:e]), min_length)
+            if text is not None:
+                hits = hits or []
+                hits.append(StringHit(s, 'base64', text))
+    if not candidates:
+        return hits or []
+    batched = _batch_hits('base64', candidates, binascii.a2b_base64, min_length)
+    if hits is None:
+        return batched
+    return sorted(batched + hits, key=_hit_offset)
+
+def _hex_hits(view, start, end, min_length):
+    """Return hex payloads in view[start:end] that decode to printable text
+
+    Odd-length runs are skipped; the rest are decoded in one binascii call.
+    """
+    candidates = [(s, view[s:e], (e - s) // 2)
+                  for s, e in map(_match_span, _compiled('hex', min_length).finditer(view, start, end))
+                  if not (e - s) % 2]
+    if not candidates:
+        return []
+    return _batch_hits('hex', candidates, binascii.a2b_hex, min_length)
+
+# Sub-detectors run on each printable run, in output order
+_RUN_DETECTORS = (
+    ('ascii', _ascii_hits),
+    ('length_prefixed', _prefixed_hits),
+    ('utf8', _utf8_hits),
+    ('base64', _base64_hits),
+    ('hex', _hex_hits),
+)
+
+def scan_strings(data, min_length=3, profiler=None):
+    """Yield a StringHit for every string found by any detector, in one pass
+
+    The buffer is traversed once to find printable UTF-8 runs. Every other
+    detector only matches printable bytes, so it runs on the current run
+    while it is still hot in cache instead of rescanning the whole buffer.
+    An ASCII run followed by a NUL is reported once, as 'null_terminated'.
+    With a profiler (see profiling.Profiler), time, bytes and hits are
+    recorded per detector.
+    """
+    view = memoryview(data)
+    runs = _compiled('utf8', min_length).finditer(view)
+    if profiler is not None:
+        yield from _scan_runs_profiled(view, runs, min_length, profiler)
+        return
+    # Same steps as _RUN_DETECTORS, inlined: a generator per run and
+    # detector costs more than the matching itself on short runs
+    size = len(view)
+    ascii_pattern = _compiled('ascii', min_length)
+    text_pattern = _compiled('text', min_length)
+    hex_pattern = _compiled('hex', min_length)
+    for run in runs:
+        start, end = run.span()
+        
+        for match in ascii_pattern.finditer(view, start, end):
+            s, e = match.span()
+            detector = 'null_terminated' if e < size and view[e] == 0 else 'ascii'
+            yield StringHit(s, detector, str(view[s:e], 'ascii'))
+        
+        for match in text_pattern.finditer(view, start, end):
+            for offset, _, text in _prefixed_in_run(view, match.start(), match.end(), min_length, (1, 2, 4)):
+                yield StringHit(offset, 'length_prefixed', text)
+        
+        for offset, text in _utf8_pieces(view, start, end, min_length):
+            yield StringHit(offset, 'utf8', text)
+        
+        # Most runs hold no candidate at all; only search for those
+        match = _BASE64_PATTERN.search(view, start, end)
+        if match:
+            yield from _base64_hits(view, match.start(), end, min_length)
+        match = hex_pattern.search(view, start, end)
+        if match:
+            yield from _hex_hits(view, match.start(), end, min_length)
+
+def _scan_runs_profiled(view, runs, min_length, profiler):
+    """scan_strings loop with per-detector accounting
+
+    Times are summed locally and handed to the profiler once per buffer,
+    so the accounting stays cheap next to the matching on short runs.
+    """
+    clock = profiler.clock
+    started = clock()
+    runs = [run.span() for run in runs]
+    profiler.add('detector:runs', clock() - started, len(view), len(runs))
+    totals = {name: [0.0, 0, 0] for name, _ in _RUN_DETECTORS}  # seconds, bytes, hits
+    try:
+        for start, end in runs:
+            for name, detector in _RUN_DETECTORS:
+                started = clock()
+                hits = list(detector(view, start, end, min_length))
+                total = totals[name]
+                total[0] += clock() - started
+                total[1] += end - start
+                total[2] += len(hits)
+                yield from hits
+    finally:
+        for name, (seconds, nbytes, items) in totals.items():
+            profiler.add('detector:' + name, seconds, nbytes, items)
+
+def hit_string(hit):
+    """Return the display form of a StringHit (encoded payloads are tagged)"""
+    prefix = _DETECTOR_PREFIXES.get(hit.detector)
+    if prefix is None and '+' in hit.detector:  # Nested payload, e.g. 'base64+hex'
+        prefix = ''.join(_DETECTOR_PREFIXES[name] for name in hit.detector.split('+'))
+    return prefix + hit.text if prefix else hit.text
+
+def nested_payloads(hits, min_length=3, depth=1, budget=None):
+    """Yield hits, each followed by the payloads encoded inside its decoded text
+
+    The text of every base64 or hex hit is scanned again for base64 and hex,
+    up to depth levels, and at most budget bytes of decoded text are
+    rescanned in total (None for no limit). Nested hits keep the offset of
+    the outermost payload; their detector names the encodings from the
+    outside in, e.g. 'base64+hex'.
+    """
+    for hit in hits:
+        yield hit
+        pending = [(hit, depth)]
+        while pending:
+            outer, levels = pending.pop()
+            if outer is not hit:
+                yield outer
+            if levels < 1 or outer.detector.rpartition('+')[2] not in _DETECTOR_PREFIXES:
+                continue
+            payload = outer.text.encode('utf-8')
+            if budget is not None:
+                if len(payload) > budget:
+                    continue
+                budget -= len(payload)
+            view = memoryview(payload)
+            inner = _base64_hits(view, 0, len(view), min_length) + _hex_hits(view, 0, len(view), min_length)
+            pending.extend((StringHit(hit.offset, outer.detector + '+' + found.detector, found.text), levels - 1)
+                           for found in reversed(inner))
+
+MAGIC = b'\x8e\x06\xde\xc0'
+
+# Bump whenever extraction output changes, so cached results are not reused
+ANALYZER_VERSION = '4'
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
 
 def read_varint(data, offset):
     value = 0
@@ -16,93 +391,135 @@ def read_varint(data, offset):
     return value, offset
 
 def extract_strings_from_binary(data, min_length=3):
-    """Extract readable ASCII/UTF-8 strings from binary data"""
-    strings = []
-    
-    # Look for null-terminated strings
-    null_terminated = re.findall(b'[\x20-\x7e]{' + str(min_length).encode() + b',}\x00', data)
-    for s in null_terminated:
-        try:
-            strings.append(s[:-1].decode('utf-8'))
-        except:
-            pass
-    
-    # Look for consecutive printable ASCII characters
-    ascii_pattern = re.compile(b'[\x20-\x7e]{' + str(min_length).encode() + b',}')
-    for match in ascii_pattern.finditer(data):
-        try:
-            decoded = match.group().decode('ascii')
-            strings.append(decoded)
-        except:
-            pass
-    
-    # Look for length-prefixed strings (various sizes)
-    for prefix_size in [1, 2, 4]:
-        i = 0
-        while i < len(data) - prefix_size:
-            try:
-                if prefix_size == 1:
-                    length = data[i]
-                elif prefix_size == 2:
-                    length = struct.unpack('<H', data[i:i+2])[0]
-                else:  # 4 bytes
-                    length = struct.unpack('<I', data[i:i+4])[0]
-                
-                if 1 <= length <= 500 and i + prefix_size + length <= len(data):
-                    string_data = data[i+prefix_size:i+prefix_size+length]
-                    try:
-                        decoded = string_data.decode('utf-8')
-                        if len(decoded) >= min_length and all(32 <= ord(c) <= 126 or c in '\n\r\t' for c in decoded):
-                            strings.append(decoded)
-                    except:
-                        pass
-            except:
-                pass
-            i += 1
+    """Extract readable ASCII/UTF-8 strings from binary data
+
+    Strings are returned once each, in order of first appearance. Use
+    scan_strings to see the offset and detector behind every hit.
+    """
+    strings = {}
+    for hit in scan_strings(data, min_length):
+        strings.setdefault(hit_string(hit), None)
+    return list(strings)  # Remove duplicates
+
+def _counts(data, chunk_size=1 << 20):
+    """Count byte values with the C counting loop, one chunk at a time"""
+    counts = Counter()
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        counts.update(bytes(view[start:start + chunk_size]))
+    return counts
+
+def byte_histogram(data):
+    """Return the 256-entry byte value histogram of data"""
+    counts = _counts(data)
+    return [counts[value] for value in range(256)]
+
+def shannon_entropy(histogram):
+    """Return the Shannon entropy, in bits per byte, of a byte histogram"""
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    return log2(total) - sum(count * log2(count) for count in histogram if count) / total
+
+def entropy_profile(data, window=ENTROPY_WINDOW, stride=None):
+    """Return [(offset, entropy)] for windows of data, stride bytes apart
+
+    The buffer is counted once in blocks of gcd(window, stride) bytes. A
+    running histogram adds each block as the window reaches it and subtracts
+    it as the window leaves, keeping sum(c * log2(c)) up to date for just the
+    byte values that changed, so each window costs O(256) rather than
+    O(window). When windows do not overlap, or the blocks are so small that
+    updating per block costs more (a stride that does not divide the window,
+    e.g. 1000 of 4096, gives 8-byte blocks), each window is counted directly
+    instead. Data shorter than one window gives a single entry.
+    """
+    stride = stride or window
+    if window < 1 or stride < 1:
+        raise ValueError(f"window and stride must be at least 1, got {window} and {stride}")
+    view = memoryview(data)
+    size = len(view)
+    if size < window:
+        return [(0, shannon_entropy(byte_histogram(view)))] if size else []
     
-    # Look for UTF-8 sequences
-    i = 0
-    while i < len(data):
-        try:
-            # Try to decode starting from this position
-            for end in range(i + min_length, min(i + 100, len(data) + 1)):
-                try:
-                    decoded = data[i:end].decode('utf-8')
-                    if len(decoded) >= min_length and all(c.isprintable() or c in '\n\r\t' for c in decoded):
-                        strings.append(decoded)
-                        break
-                except:
-                    continue
-        except:
-            pass
-        i += 1
+    block = gcd(window, stride)
+    # Rough costs: a block update ~12 units per distinct byte value, a
+    # direct window count ~1 unit per byte (measured on CPython)
+    if stride >= window or stride * (100 + 12 * min(block, 256)) >= block * (900 + window):
+        return [(start, shannon_entropy(byte_histogram(view[start:start + window])))
+                for start in range(0, size - window + 1, stride)]
+    blocks_per_window = window // block
+    blocks_per_stride = stride // block
+    counts = [0] * 256
+    weighted = 0.0  # sum(c * log2(c)) over counts
+    in_window = deque()
+    profile = []
     
-    # Look for base64-like patterns
-    base64_pattern = re.compile(b'[A-Za-z0-9+/]{8,}={0,2}')
-    for match in base64_pattern.finditer(data):
-        try:
-            import base64
-            decoded = base64.b64decode(match.group()).decode('utf-8')
-            if len(decoded) >= min_length and all(c.isprintable() or c in '\n\r\t' for c in decoded):
-                strings.append(f"base64:{decoded}")
-        except:
-            pass
+    def apply(block_counts, sign):
+        nonlocal weighted
+        for value, count in block_counts.items():
+            old = counts[value]
+            new = counts[value] = old + sign * count
+            weighted += (new * log2(new) if new else 0.0) - (old * log2(old) if old else 0.0)
     
-    # Look for hex-encoded strings
-    hex_pattern = re.compile(b'[0-9a-fA-F]{' + str(min_length*2).encode() + b',}')
-    for match in hex_pattern.finditer(data):
-        if len(match.group()) % 2 == 0:
-            try:
-                hex_bytes = bytes.fromhex(match.group().decode('ascii'))
-                decoded = hex_bytes.decode('utf-8')
-                if len(decoded) >= min_length and all(c.isprintable() or c in '\n\r\t' for c in decoded):
-                    strings.append(f"hex:{decoded}")
-            except:
-                pass
+    for index in range(size // block):
+        block_counts = Counter(bytes(view[index * block:(index + 1) * block]))
+        apply(block_counts, 1)
+        in_window.append(block_counts)
+        if len(in_window) > blocks_per_window:
+            apply(in_window.popleft(), -1)
+        first = index + 1 - blocks_per_window
+        if first >= 0 and first % blocks_per_stride == 0:
+            profile.append((first * block, max(log2(window) - weighted / window, 0.0)))
+    return profile
+
+def _count_ngrams(view, start, end, n):
+    """Exactly count the n-grams of view starting in [start, end)
+
+    For n of 1, 2, 4 or 8 the grams are packed into native integers by
+    casting one strided view per alignment, so the counting loop stays in C.
+    """
+    counts = Counter()
+    end = min(end, len(view) - n + 1)
+    fmt = _NGRAM_FORMATS.get(n)
+    if fmt is None:
+        counts.update(bytes(view[i:i + n]) for i in range(start, end))
+        return counts
+    for first in range(start, min(start + n, end)):
+        grams = (end - first + n - 1) // n
+        counts.update(view[first:first + grams * n].cast(fmt))
+    return counts
+
+def top_ngrams(data, n=4, k=3, capacity=1024, chunk_size=1 << 18):
+    """Return the k most frequent n-grams of data, using bounded memory
+
+    Chunks are counted exactly and folded into a Misra-Gries summary of at
+    most capacity n-grams. Whenever the summary overflows, every count is
+    lowered by the (capacity+1)-th largest one and the total of those
+    reductions becomes the error bound. Results are NgramCount(gram, count,
+    error) tuples: count is a lower bound and the true count is at most
+    count + error (error is 0, and counts exact, until the summary first
+    overflows). Ties are ordered by gram bytes.
+    """
+    view = memoryview(data).cast('B')
+    summary = Counter()
+    error = 0
+    for start in range(0, max(len(view) - n + 1, 0), chunk_size):
+        counts = _count_ngrams(view, start, start + chunk_size, n)
+        counts.update(summary)
+        if len(counts) > capacity:
+            floor = sorted(counts.values(), reverse=True)[capacity]
+            error += floor
+            summary = Counter({gram: count - floor for gram, count in counts.items() if count > floor})
+        else:
+            summary = counts
     
-    return list(set(strings))  # Remove duplicates
+    fmt = _NGRAM_FORMATS.get(n)
+    if fmt is not None:
+        summary = {gram.to_bytes(n, sys.byteorder): count for gram, count in summary.items()}
+    ranked = sorted(summary.items(), key=lambda item: (-item[1], item[0]))[:k]
+    return [NgramCount(gram, count, error) for gram, count in ranked]
 
-def analyze_binary_structure(data):
+def analyze_binary_structure(data, window=ENTROPY_WINDOW, stride=None):
     """Analyze binary data structure for patterns"""
     analysis = []
     
@@ -111,221 +528,973 @@ def analyze_binary_structure(data):
         magic = data[:4]
         analysis.append(f"Magic bytes: {magic.hex()}")
     
-    # Check entropy (simple measure)
+    # Check entropy
     if len(data) > 0:
-        byte_counts = [0] * 256
-        for byte in data:
-            byte_counts[byte] += 1
+        byte_counts = byte_histogram(data)
         
         non_zero = sum(1 for count in byte_counts if count > 0)
         analysis.append(f"Unique bytes: {non_zero}/256")
+        analysis.append(f"Entropy: {shannon_entropy(byte_counts):.2f} bits/byte")
+        
+        # Local entropy, to spot compressed or encrypted regions
+        if len(data) >= 2 * window:
+            profile = entropy_profile(data, window, stride)
+            values = [entropy for _, entropy in profile]
+            high = sum(1 for entropy in values if entropy >= HIGH_ENTROPY)
+            analysis.append(f"Entropy profile ({window}-byte windows): min {min(values):.2f}, "
+                            f"max {max(values):.2f}, {high}/{len(values)} windows >= {HIGH_ENTROPY} bits/byte")
     
     # Look for repeating patterns
     if len(data) >= 8:
-        patterns = {}
-        for i in range(len(data) - 3):
-            pattern = data[i:i+4]
-            if pattern in patterns:
-                patterns[pattern] += 1
+        common_patterns = top_ngrams(data, 4, 3)
+        if common_patterns and common_patterns[0].count > 1:
+            found = [(p.gram.hex(), p.count) for p in common_patterns]
+            if common_patterns[0].error:
+                analysis.append(f"Common 4-byte patterns (approx., each up to {common_patterns[0].error} higher): {found}")
             else:
-                patterns[pattern] = 1
-        
-        common_patterns = sorted(patterns.items(), key=lambda x: x[1], reverse=True)[:3]
-        if common_patterns and common_patterns[0][1] > 1:
-            analysis.append(f"Common 4-byte patterns: {[(p.hex(), count) for p, count in common_patterns]}")
+                analysis.append(f"Common 4-byte patterns: {found}")
     
     return analysis
 
+def _compile_keyword_pattern(words, flags=0):
+    """Compile words into one regex that reports every word found at a position
+
+    The words are laid out as a trie inside a single lookahead, with an empty
+    capture group where each word ends. For a match m, chains[m.lastindex]
+    lists every word (by index) that starts at m.start(), longest first, so
+    overlapping and nested words all come out of one left-to-right scan.
+    Works for str and bytes words alike; a repeated word keeps its first index.
+    """
+    trie = {}
+    for index, word in enumerate(words):
+        if not word:
+            continue
+        node = trie
+        for i in range(len(word)):
+            node = node.setdefault(word[i:i + 1], {})
+        node.setdefault(None, index)
+    empty = words[0][:0] if words else ''
+    text = (lambda s: s) if isinstance(empty, str) else (lambda s: s.encode('ascii'))
+    chains = [None]  # Capture groups are numbered from 1
+    
+    def render(node, chain):
+        parts = []
+        if None in node:
+            chain = [node[None]] + chain
+            chains.append(chain)
+            parts.append(text('()'))
+        branches = []
+        for key in sorted(k for k in node if k is not None):
+            edge, child = key, node[key]
+            # Collapse single-child runs so only branch points nest
+            while None not in child and len(child) == 1:
+                (next_key, child), = child.items()
+                edge += next_key
+            branches.append(re.escape(edge) + render(child, chain))
+        if branches:
+            body = text('|').join(branches)
+            if None in node:
+                parts.append(text('(?:') + body + text(')?'))
+            elif len(branches) > 1:
+                parts.append(text('(?:') + body + text(')'))
+            else:
+                parts.append(body)
+        return empty.join(parts)
+    
+    body = render(trie, [])
+    if not body:
+        body = text('(?!)')  # No words: never match
+    return re.compile(text('(?=') + body + text(')'), flags), chains
+
+# Category rules in priority order: a string goes to the first category with
+# a matching keyword. Case-sensitive rules are checked against the original
+# string, the rest against its lowercase form. 'short_codes' has no keywords
+# and is decided by shape; strings matching nothing are 'other'.
+CATEGORY_RULES = [
+    ('api_calls', ['create', 'read', 'write', 'fetch', 'request', 'connect', 'verify', 'hash', 'encrypt', 'decrypt', 'sign'], False),
+    ('file_paths', ['/', '\\', '.js', '.bin', '.log', '.html', '.png'], True),
+    ('urls', ['http://', 'https://', 'localhost'], False),
+    ('crypto_related', ['sha', 'rsa', 'aes', 'gcm', 'hash', 'signature', 'crypto', 'key', 'cert'], False),
+    ('node_modules', ['node:', 'require', 'module', 'Buffer'], True),
+    ('error_messages', ['failed', 'error', 'invalid', 'not found', 'mismatch'], False),
+    ('suspicious', ['sussy', 'sus', 'bypass', 'hack'], False),
+    ('short_codes', None, False),
+    ('config_keys', ['config', 'option', 'setting', 'env', 'dir', 'path', 'name'], False),
+]
+CATEGORY_NAMES = ['api_calls', 'file_paths', 'urls', 'crypto_related', 'node_modules',
+                  'error_messages', 'config_keys', 'suspicious', 'short_codes', 'other']
+
+# Functionality flags: (label, lowercase keywords)
+FUNCTIONALITY_RULES = [
+    ("🌐 Network communication (HTTP requests)", ['fetch', 'request', 'http']),
+    ("🔐 Cryptographic operations", ['crypto', 'hash', 'sign']),
+    ("📁 File system operations", ['file', 'read', 'write']),
+    ("⚙️ Worker threads/background processing", ['worker']),
+    ("✅ Code/data verification", ['verify', 'signature']),
+    ("📥 File download/upload", ['download', 'upload']),
+    ("📝 Logging system", ['log']),
+    ("🔄 Auto-update functionality", ['update']),
+    ("⚠️ Security/anti-tamper checks", ['sus']),
+]
+
+def _build_keyword_table():
+    """Merge every rule keyword into one matcher over lowercased text
+
+    Returns (pattern, chains, masks) where masks[word] is
+    (category_bits, functionality_bits, exact_checks) and exact_checks lists
+    (category_bit, keyword) pairs that must also match case-sensitively.
+    """
+    table = {}
+    for bit, (_, keywords, case_sensitive) in enumerate(CATEGORY_RULES):
+        for keyword in keywords or ():
+            entry = table.setdefault(keyword.lower(), [0, 0, []])
+            if case_sensitive:
+                entry[2].append((1 << bit, keyword))
+            else:
+                entry[0] |= 1 << bit
+    for bit, (_, keywords) in enumerate(FUNCTIONALITY_RULES):
+        for keyword in keywords:
+            table.setdefault(keyword, [0, 0, []])[1] |= 1 << bit
+    words = list(table)
+    pattern, chains = _compile_keyword_pattern(words)
+    return pattern, chains, [tuple(table[word]) for word in words]
+
+_KEYWORD_PATTERN, _KEYWORD_CHAINS, _KEYWORD_MASKS = _build_keyword_table()
+_ALL_FUNCTIONALITY = (1 << len(FUNCTIONALITY_RULES)) - 1
+_SHORT_CODES_BIT = [rule[0] for rule in CATEGORY_RULES].index('short_codes')
+
+def keyword_masks(s):
+    """Return (category_bits, functionality_bits) for a string in one scan
+
+    Bits follow the order of CATEGORY_RULES and FUNCTIONALITY_RULES.
+    """
+    s_lower = s.lower()
+    aligned = len(s_lower) == len(s)
+    category_bits = 0
+    functionality_bits = 0
+    for match in _KEYWORD_PATTERN.finditer(s_lower):
+        for word in _KEYWORD_CHAINS[match.lastindex]:
+            category, functionality, exact_checks = _KEYWORD_MASKS[word]
+            category_bits |= category
+            functionality_bits |= functionality
+            for bit, keyword in exact_checks:
+                if s.startswith(keyword, match.start()) if aligned else keyword in s:
+                    category_bits |= bit
+    return category_bits, functionality_bits
+
+def categorize_string(s, category_bits=None):
+    """Return the category name for one string (None for blank strings)"""
+    if not s or len(s.strip()) == 0:
+        return None
+    if category_bits is None:
+        category_bits = keyword_masks(s)[0]
+    # The lowest set bit is the highest-priority keyword category
+    first = (category_bits & -category_bits).bit_length() - 1
+    if 0 <= first < _SHORT_CODES_BIT:
+        return CATEGORY_RULES[first][0]
+    # Short codes (might be obfuscated identifiers)
+    if len(s) <= 5 and s.isalnum():
+        return 'short_codes'
+    return CATEGORY_RULES[first][0] if first >= 0 else 'other'
+
 def categorize_strings(strings):
     """Categorize strings by their likely purpose"""
-    categories = {
-        'api_calls': [],
-        'file_paths': [],
-        'urls': [],
-        'crypto_related': [],
-        'node_modules': [],
-        'error_messages': [],
-        'config_keys': [],
-        'suspicious': [],
-        'short_codes': [],
-        'other': []
-    }
+    categories = {category: [] for category in CATEGORY_NAMES}
     
     for s in strings:
-        if not s or len(s.strip()) == 0:
-            continue
-            
-        s_lower = s.lower()
-        
-        # API calls and functions 
-        if any(pattern in s_lower for pattern in ['create', 'read', 'write', 'fetch', 'request', 'connect', 'verify', 'hash', 'encrypt', 'decrypt', 'sign']):
-            categories['api_calls'].append(s)
-        # File paths
-        elif any(pattern in s for pattern in ['/', '\\', '.js', '.bin', '.log', '.html', '.png']):
-            categories['file_paths'].append(s)
-        # URLs
-        elif any(pattern in s_lower for pattern in ['http://', 'https://', 'localhost']):
-            categories['urls'].append(s)
-        # Crypto related
-        elif any(pattern in s_lower for pattern in ['sha', 'rsa', 'aes', 'gcm', 'hash', 'signature', 'crypto', 'key', 'cert']):
-            categories['crypto_related'].append(s)
-        # Node modules
-        elif any(pattern in s for pattern in ['node:', 'require', 'module', 'Buffer']):
-            categories['node_modules'].append(s)
-        # Error messages
-        elif any(pattern in s_lower for pattern in ['failed', 'error', 'invalid', 'not found', 'mismatch']):
-            categories['error_messages'].append(s)
-        # Suspicious strings
-        elif any(pattern in s_lower for pattern in ['sussy', 'sus', 'bypass', 'hack']):
-            categories['suspicious'].append(s)
-        # Short codes (might be obfuscated identifiers)
-        elif len(s) <= 5 and s.isalnum():
-            categories['short_codes'].append(s)
-        # Config-like keys
-        elif any(pattern in s_lower for pattern in ['config', 'option', 'setting', 'env', 'dir', 'path', 'name']):
-            categories['config_keys'].append(s)
-        else:
-            categories['other'].append(s)
+        category = categorize_string(s)
+        if category is not None:
+            categories[category].append(s)
     
     return categories
 
-def find_string_relationships(strings):
-    """Find potential relationships between strings"""
-    relationships = []
+def _build_containment_trie(strings):
+    """Index strings in a trie for finding which of them occur inside a text
+
+    Nodes are dicts keyed by character; '' holds the index of a string ending
+    there. A subtree holding a single string is collapsed into a
+    (remaining_tail, index) leaf, so memory follows the branching structure
+    rather than the total number of characters.
+    """
+    root = {}
+    for index, word in enumerate(strings):
+        node = root
+        i = 0
+        while True:
+            if i == len(word):
+                node.setdefault('', index)
+                break
+            child = node.get(word[i])
+            if child is None:
+                node[word[i]] = (word[i + 1:], index)
+                break
+            if type(child) is tuple:
+                # Split the collapsed leaf one level down and keep walking
+                tail, other = child
+                child = node[word[i]] = {}
+                if tail:
+                    child[tail[0]] = (tail[1:], other)
+                else:
+                    child[''] = other
+            node = child
+            i += 1
+    return root
+
+def _contained_strings(trie, text):
+    """Yield the index of every indexed string occurring in text (with repeats)"""
+    size = len(text)
+    for start in range(size):
+        node = trie
+        i = start
+        while True:
+            found = node.get('')
+            if found is not None:
+                yield found
+            if i == size:
+                break
+            child = node.get(text[i])
+            if child is None:
+                break
+            if type(child) is tuple:
+                if text.startswith(child[0], i + 1):
+                    yield child[1]
+                break
+            node = child
+            i += 1
+
+def iter_string_relationships(strings):
+    """Lazily yield relationships between strings, without comparing all pairs
+
+    Strings are visited in order. For each one this yields, in order:
+
+    - the strings it contains, found through a trie of all strings;
+    - earlier strings that share its first 3 characters;
+    - earlier strings that share its last 3 characters.
+
+    Prefix and suffix candidates come from hash buckets keyed on those
+    characters. Each pair is reported once, with containment taking priority
+    over prefix and prefix over suffix. Work done is proportional to the
+    strings visited, so a caller taking only the first few results stops
+    early.
+    """
+    strings = list(dict.fromkeys(s for s in strings if s))
+    trie = _build_containment_trie(strings)
+    prefix_buckets = {}
+    suffix_buckets = {}
     
-    # Group related strings
-    for i, s1 in enumerate(strings):
-        for j, s2 in enumerate(strings[i+1:], i+1):
-            # Skip empty strings
-            if not s1 or not s2:
-                continue
-                
-            # Check if one is contained in another
-            if s1 in s2 and s1 != s2:
-                relationships.append(f"'{s1}' is part of '{s2}'")
-            elif s2 in s1 and s1 != s2:
-                relationships.append(f"'{s2}' is part of '{s1}'")
+    for s in strings:
+        # Check if one is contained in another
+        seen = set()
+        for index in _contained_strings(trie, s):
+            part = strings[index]
+            if part != s and index not in seen:
+                seen.add(index)
+                yield f"'{part}' is part of '{s}'"
+        
+        # Check for similar prefixes/suffixes
+        if len(s) > 3:
+            prefix, suffix = s[:3], s[-3:]
+            bucket = prefix_buckets.setdefault(prefix, [])
+            for other in bucket:
+                if other not in s and s not in other:
+                    yield f"Similar prefix: '{other}' <-> '{s}'"
+            bucket.append(s)
             
-            # Check for similar prefixes/suffixes
-            elif len(s1) > 3 and len(s2) > 3:
-                if s1.startswith(s2[:3]) or s2.startswith(s1[:3]):
-                    relationships.append(f"Similar prefix: '{s1}' <-> '{s2}'")
-                elif s1.endswith(s2[-3:]) or s2.endswith(s1[-3:]):
-                    relationships.append(f"Similar suffix: '{s1}' <-> '{s2}'")
+            bucket = suffix_buckets.setdefault(suffix, [])
+            for other in bucket:
+                if other[:3] != prefix and other not in s and s not in other:
+                    yield f"Similar suffix: '{other}' <-> '{s}'"
+            bucket.append(s)
+
+def find_string_relationships(strings, limit=20):
+    """Find potential relationships between strings
+
+    Returns at most limit relationships (all of them when limit is None).
+    """
+    return list(islice(iter_string_relationships(strings), limit))
+
+def classify_strings(strings):
+    """Return (categories, functionality) with one keyword scan per string
+
+    Same results as categorize_strings and analyze_functionality combined.
+    """
+    categories = {category: [] for category in CATEGORY_NAMES}
+    functionality_bits = 0
+    for s in strings:
+        category_bits, bits = keyword_masks(s)
+        functionality_bits |= bits
+        category = categorize_string(s, category_bits)
+        if category is not None:
+            categories[category].append(s)
     
-    return relationships[:20]  # Limit to first 20 relationships
+    functionality = [label for bit, (label, _) in enumerate(FUNCTIONALITY_RULES)
+                     if functionality_bits & (1 << bit)]
+    return categories, functionality
+
+_CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORY_NAMES)}
+
+def _string_classes(s):
+    """Return (category code, functionality bits) of s; the code is -1 for blank strings"""
+    category_bits, functionality_bits = keyword_masks(s)
+    category = categorize_string(s, category_bits)
+    return (-1 if category is None else _CATEGORY_CODES[category]), functionality_bits
+
+def classify_table(table):
+    """classify_strings for a string_table.StringTable, working on string ids
+
+    Returns (categories, functionality) where categories maps every
+    category name to an array of the ids of its strings.
+    """
+    table.categorize(_string_classes)
+    groups = table.ids_by_category()
+    categories = {category: groups.get(code, array('I')) for category, code in _CATEGORY_CODES.items()}
+    functionality = [label for bit, (label, _) in enumerate(FUNCTIONALITY_RULES)
+                     if table.flags & (1 << bit)]
+    return categories, functionality
 
 def analyze_functionality(strings):
     """Analyze what the code might be doing based on strings"""
-    functionality = []
-    
-    # Check for different capabilities
-    if any('fetch' in s.lower() or 'request' in s.lower() or 'http' in s.lower() for s in strings):
-        functionality.append("🌐 Network communication (HTTP requests)")
-    
-    if any('crypto' in s.lower() or 'hash' in s.lower() or 'sign' in s.lower() for s in strings):
-        functionality.append("🔐 Cryptographic operations")
-    
-    if any('file' in s.lower() or 'read' in s.lower() or 'write' in s.lower() for s in strings):
-        functionality.append("📁 File system operations")
-    
-    if any('worker' in s.lower() for s in strings):
-        functionality.append("⚙️ Worker threads/background processing")
-    
-    if any('verify' in s.lower() or 'signature' in s.lower() for s in strings):
-        functionality.append("✅ Code/data verification")
-    
-    if any('download' in s.lower() or 'upload' in s.lower() for s in strings):
-        functionality.append("📥 File download/upload")
-    
-    if any('log' in s.lower() for s in strings):
-        functionality.append("📝 Logging system")
-    
-    if any('update' in s.lower() for s in strings):
-        functionality.append("🔄 Auto-update functionality")
-    
-    if any('sus' in s.lower() for s in strings):
-        functionality.append("⚠️ Security/anti-tamper checks")
+    functionality_bits = 0
+    for s in strings:
+        functionality_bits |= keyword_masks(s)[1]
+        if functionality_bits == _ALL_FUNCTIONALITY:
+            break
     
-    return functionality
+    return [label for bit, (label, _) in enumerate(FUNCTIONALITY_RULES)
+            if functionality_bits & (1 << bit)]
 
-def decompile_bin(filepath):
-    with open(filepath, 'rb') as f:
-        data = f.read()
+@contextmanager
+def map_bin_file(filepath):
+    """Map a .bin file read-only and yield a zero-copy memoryview over it
 
-    if data[0:4] != b'\x8e\x06\xde\xc0':
-        print("Not a valid NW.js .bin file.")
+    Slices of the view stay valid while the block is open. Views still held
+    after the block ends keep the mapping alive until they are released.
+    """
+    with open(filepath, 'rb') as f:
+        try:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty files cannot be mapped
+            mapping = None
+    if mapping is None:
+        yield memoryview(b'')
         return
+    view = memoryview(mapping)
+    try:
+        yield view
+    finally:
+        view.release()
+        try:
+            mapping.close()
+        except BufferError:
+            pass  # A caller still holds a slice; the mapping closes with it
 
-    print(f"[+] Magic Header OK: {data[0:4].hex()}")
-    offset = 4
-    const_count, offset = read_varint(data, offset)
-    print(f"[+] Constant Pool Entries: {const_count}")
+# Filters pushed down into analyze_constants; None means no limit. Ranges
+# are (start, stop) entry numbers and (min, max) byte sizes, either open.
+# decode_depth turns on nested payload decoding (see nested_payloads), with
+# decode_budget bytes of decoded text rescanned per constant.
+ExtractionLimits = namedtuple('ExtractionLimits', [
+    'max_per_entry', 'max_total', 'categories', 'max_length', 'entry_range', 'size_range',
+    'decode_depth', 'decode_budget',
+])
+ExtractionLimits.__new__.__defaults__ = (None,) * len(ExtractionLimits._fields)  # defaults= needs Python 3.7
+DEFAULT_DECODE_BUDGET = 1 << 20
+# Columns of the constant pool table: offsets[i] and lengths[i] of entry i
+ConstantIndex = namedtuple('ConstantIndex', ['offsets', 'lengths'])
+ConstantEntry = namedtuple('ConstantEntry', ['index', 'offset', 'length', 'data'])
+ConstantAnalysis = namedtuple('ConstantAnalysis', ['entry', 'text', 'strings', 'hits', 'binary_analysis'])
 
-    all_strings = []
-    
+def read_pool_header(data):
+    """Check the magic header and return (constant_count, table_offset)"""
+    if data[0:4] != MAGIC:
+        raise ValueError("Not a valid NW.js .bin file.")
+    return read_varint(data, 4)
+
+def iter_constant_table(data, const_count, offset):
+    """Yield a ConstantEntry for each entry of the constant pool table"""
     for i in range(const_count):
-        length, offset = read_varint(data, offset)
-        const_data = data[offset:offset+length]
-        
-        print(f"\n[{i:02}] Length: {length}")
-        
-        # Try direct UTF-8 decode first
+        length = data[offset]
+        if length < 0x80:  # Single-byte varint
+            offset += 1
+        else:
+            length, offset = read_varint(data, offset)
+        yield ConstantEntry(i, offset, length, data[offset:offset+length])
+        offset += length
+
+def read_constant_index(data, const_count, offset):
+    """Walk the constant pool table once and return its ConstantIndex
+
+    Each length varint sits right before its entry's data, so the walk is
+    sequential; it only reads the length bytes, never the entry data. After
+    it, constant_entry reads any entry in O(1).
+    """
+    offsets = array('Q')
+    lengths = array('Q')
+    add_offset = offsets.append
+    add_length = lengths.append
+    for _ in range(const_count):
+        length = data[offset]
+        if length < 0x80:  # Single-byte varint
+            offset += 1
+        else:
+            length, offset = read_varint(data, offset)
+        add_offset(offset)
+        add_length(length)
+        offset += length
+    return ConstantIndex(offsets, lengths)
+
+def constant_entry(data, index, i):
+    """Return entry i of the constant pool using a ConstantIndex"""
+    offset = index.offsets[i]
+    length = index.lengths[i]
+    return ConstantEntry(i, offset, length, data[offset:offset+length])
+
+INDEX_SUFFIX = '.idx'
+# Sidecar index: magic, version, file size, mtime (ns), header digest, entry
+# count, padded to 64 bytes, then the offsets and the lengths column as
+# little-endian 64-bit integers
+_INDEX_HEADER = struct.Struct('<4sHQq20sQ14x')
+_INDEX_MAGIC = b'NWIX'
+_INDEX_VERSION = 1
+_INDEX_HASHED_BYTES = 4096
+
+def _index_key(filepath, data):
+    """Return (size, mtime_ns, header digest) identifying one version of a file"""
+    stat = os.stat(filepath)
+    digest = hashlib.blake2b(data[:_INDEX_HASHED_BYTES], digest_size=20).digest()
+    return len(data), stat.st_mtime_ns, digest
+
+def _read_index_sidecar(path, key, const_count):
+    """Return the ConstantIndex stored at path, or None if missing or stale
+
+    On little-endian machines the columns are views into a mapping of the
+    sidecar, so opening it costs the same for any number of entries.
+    """
+    column = const_count * 8
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(_INDEX_HEADER.size)
+            if len(header) != _INDEX_HEADER.size or os.fstat(f.fileno()).st_size != len(header) + 2 * column:
+                return None
+            magic, version, size, mtime_ns, digest, count = _INDEX_HEADER.unpack(header)
+            if (magic, version, (size, mtime_ns, digest), count) != (_INDEX_MAGIC, _INDEX_VERSION, key, const_count):
+                return None
+            if sys.byteorder == 'big':
+                offsets = array('Q')
+                lengths = array('Q')
+                offsets.fromfile(f, count)
+                lengths.fromfile(f, count)
+                offsets.byteswap()
+                lengths.byteswap()
+                return ConstantIndex(offsets, lengths)
+            if not count:
+                return ConstantIndex(array('Q'), array('Q'))
+            view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    except (OSError, EOFError, ValueError):
+        return None
+    start = _INDEX_HEADER.size
+    return ConstantIndex(view[start:start + column].cast('Q'), view[start + column:].cast('Q'))
+
+def _write_index_sidecar(path, key, index):
+    """Save index at path atomically; failures (e.g. read-only dirs) are ignored"""
+    offsets, lengths = index
+    if sys.byteorder == 'big':
+        offsets, lengths = array('Q', offsets), array('Q', lengths)
+        offsets.byteswap()
+        lengths.byteswap()
+    temp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp, 'wb') as f:
+            f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, _INDEX_VERSION, *key, len(offsets)))
+            offsets.tofile(f)
+            lengths.tofile(f)
+        os.replace(temp, path)
+    except OSError:
         try:
-            decoded = const_data.decode('utf-8')
-            if decoded.strip():  # Only show non-empty strings
-                print(f"     Direct UTF-8: {repr(decoded)}")
-                all_strings.append(decoded)
-            else:
-                print(f"     Empty/whitespace string")
-                all_strings.append(decoded)
-        except:
-            # If direct decode fails, extract strings from binary
-            extracted_strings = extract_strings_from_binary(const_data, min_length=3)
-            if extracted_strings:
-                print(f"     Extracted strings: {extracted_strings}")
-                all_strings.extend(extracted_strings)
-            else:
-                # Show binary analysis
-                analysis = analyze_binary_structure(const_data)
-                print(f"     Binary data ({len(const_data)} bytes):")
-                for info in analysis:
-                    print(f"       {info}")
-                if len(const_data) <= 50:
-                    print(f"       Hex: {const_data.hex()}")
+            os.remove(temp)
+        except OSError:
+            pass
+
+def load_constant_index(filepath, data, const_count, offset, sidecar=None, write=False):
+    """Return the ConstantIndex of a mapped .bin file, reusing a sidecar index
+
+    The sidecar (filepath + INDEX_SUFFIX unless given) is keyed by the
+    file's size, mtime and a hash of its first 4 KiB. When it is missing
+    or stale the table is walked; only with write is the sidecar then
+    (re)written, so later opens skip the walk entirely. Without it nothing
+    is written next to the input.
+    """
+    sidecar = sidecar or filepath + INDEX_SUFFIX
+    key = _index_key(filepath, data)
+    index = _read_index_sidecar(sidecar, key, const_count)
+    if index is None:
+        index = read_constant_index(data, const_count, offset)
+        if write:
+            _write_index_sidecar(sidecar, key, index)
+    return index
+
+def iter_constants(filepath):
+    """Yield a ConstantEntry for each constant in a .bin file, lazily
+
+    Entry data is a zero-copy view into the mapped file and stays valid while
+    the iterator is open. Raises ValueError if the magic header is wrong.
+    """
+    with map_bin_file(filepath) as data:
+        const_count, offset = read_pool_header(data)
+        yield from iter_constant_table(data, const_count, offset)
+
+def decode_constants(entries):
+    """Try a direct UTF-8 decode of each entry (text is None when it fails)"""
+    for entry in entries:
+        try:
+            text = str(entry.data, 'utf-8')
+        except UnicodeDecodeError:
+            text = None
+        yield ConstantAnalysis(entry, text, None, None, None)
+
+def _with_hits(result, hits, binary_analysis=None, profiler=None):
+    """Return result with its strings and, if none were found, binary analysis"""
+    strings = list(dict.fromkeys(hit_string(hit) for hit in hits))
+    if not strings and binary_analysis is None:
+        if profiler is None:
+            binary_analysis = analyze_binary_structure(result.entry.data)
+        else:
+            with profiler.stage('binary_structure', result.entry.length, 1):
+                binary_analysis = analyze_binary_structure(result.entry.data)
+    return result._replace(strings=strings, hits=hits, binary_analysis=binary_analysis)
+
+def _cached_result(result, cache, min_length):
+    """Return result filled from cache, or None if the constant is not cached"""
+    if cache is None:
+        return None
+    value = cache.get(result.entry.data, min_length)
+    if value is None:
+        return None
+    hits = [StringHit(*hit) for hit in value['hits']]
+    return _with_hits(result, hits, value['binary_analysis'])
+
+def _store_result(result, cache, min_length):
+    """Save the extraction output of result in cache"""
+    if cache is not None:
+        value = {'hits': [list(hit) for hit in result.hits], 'binary_analysis': result.binary_analysis}
+        cache.put(result.entry.data, min_length, value)
+
+def _string_allowed(s, limits):
+    """True if s passes the length and category filters of limits"""
+    if limits.max_length is not None and len(s) > limits.max_length:
+        return False
+    return limits.categories is None or categorize_string(s) in limits.categories
+
+def _apply_limits(hits, limits):
+    """Return (kept hits, whether any hit was found) for one constant
+
+    hits may be a live scan_strings generator: it is abandoned as soon as
+    max_per_entry distinct strings are kept, so the rest of the constant is
+    never scanned.
+    """
+    verdicts = {}
+    kept = []
+    kept_strings = 0
+    found = False
+    for hit in hits:
+        found = True
+        s = hit_string(hit)
+        verdict = verdicts.get(s)
+        if verdict is None:
+            verdict = verdicts[s] = _string_allowed(s, limits)
+            if verdict:
+                kept_strings += 1
+        if verdict:
+            kept.append(hit)
+            if kept_strings == limits.max_per_entry:
+                break
+    return kept, found
+
+def _decode_nested(hits, min_length, limits):
+    """Add the nested payloads requested by limits to hits"""
+    if not limits.decode_depth:
+        return hits
+    return nested_payloads(hits, min_length, limits.decode_depth, limits.decode_budget)
+
+def _limit_result(result, limits, min_length):
+    """Apply limits to an already extracted result"""
+    if result.text is not None:
+        return result._replace(strings=[s for s in result.strings if _string_allowed(s, limits)])
+    hits, _ = _apply_limits(_decode_nested(result.hits, min_length, limits), limits)
+    # Strings filtered away do not make the constant binary data
+    return _with_hits(result, hits, None if hits else result.binary_analysis or [])
+
+def extract_constants(results, min_length=3, workers=None, chunk_size=PARALLEL_CHUNK_SIZE, cache=None,
+                      profiler=None, limits=None):
+    """Fill in strings for decoded entries and run extraction on the rest
+
+    Entries that yield no strings get a binary structure analysis instead.
+    With workers > 1 the extraction runs in a process pool; results still
+    come out in entry order and match the single-process output. With a
+    cache (see analysis_cache.AnalysisCache), constants seen before skip
+    extraction entirely. A profiler records per-detector statistics, which
+    are only available when extraction runs in this process. With limits
+    (an ExtractionLimits), only the strings they allow are kept; in this
+    process the scan of a constant stops at limits.max_per_entry strings,
+    and such partial results are not cached.
+    """
+    if workers and workers > 1:
+        results = _extract_constants_parallel(results, min_length, workers, chunk_size, cache, profiler)
+        if limits is None:
+            yield from results
+        else:
+            yield from (_limit_result(result, limits, min_length) for result in results)
+        return
+    for result in results:
+        if result.text is not None:
+            result = result._replace(strings=[result.text])
+            yield result if limits is None else _limit_result(result, limits, min_length)
+            continue
+        cached = _cached_result(result, cache, min_length)
+        if cached is not None:
+            yield cached if limits is None else _limit_result(cached, limits, min_length)
+            continue
+        hits = scan_strings(result.entry.data, min_length, profiler)
+        if limits is not None:
+            hits, found = _apply_limits(_decode_nested(hits, min_length, limits), limits)
+            yield _with_hits(result, hits, [] if found and not hits else None, profiler)
+            continue
+        result = _with_hits(result, list(hits), profiler=profiler)
+        _store_result(result, cache, min_length)
+        yield result
+
+def _split_for_workers(data, chunk_size):
+    """Yield (window_bytes, window_start, owned_start) pieces covering data
+
+    Pieces are cut at bytes that can never be part of a text run, so no
+    string spans two pieces. Each window also carries a few bytes before its
+    owned range (for length prefixes) and the cut byte after it (for the
+    null-terminator check); hits before owned_start belong to the previous
+    piece and are dropped by the worker.
+    """
+    size = len(data)
+    start = 0
+    while start < size:
+        split = size
+        if start + chunk_size < size:
+            match = _SPLIT_BYTE_PATTERN.search(data, start + chunk_size)
+            if match:
+                split = match.start()
+        window_start = max(start - max(_PREFIX_STRUCTS), 0)
+        yield bytes(data[window_start:min(split + 1, size)]), window_start, start
+        start = split
+
+def _scan_pieces(pieces, min_length):
+    """Worker: scan a batch of pieces and return the owned hits of each"""
+    return [
+        [
+            StringHit(hit.offset + window_start, hit.detector, hit.text)
+            for hit in scan_strings(window, min_length)
+            if hit.offset + window_start >= owned_start
+        ]
+        for window, window_start, owned_start in pieces
+    ]
+
+def _extract_constants_parallel(results, min_length, workers, chunk_size, cache=None, profiler=None):
+    """Process-pool version of extract_constants
+
+    Entries that need extraction are cut into pieces of about chunk_size
+    bytes (large constants into several, small ones batched together) and
+    scanned by the pool. Results are yielded strictly in entry order, with
+    at most a couple of batches per worker in flight.
+    """
+    max_in_flight = workers * 2
+    pending = deque()  # (result, [(task, piece_index)]) in entry order
+    futures = {}       # task -> future
+    remaining = {}     # task -> pieces not yet collected
+    batch = []
+    batch_bytes = 0
+    next_task = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = iter(results)
+        exhausted = False
+        while pending or not exhausted:
+            if not exhausted and len(futures) < max_in_flight:
+                result = next(results, None)
+                if result is not None and result.text is None:
+                    result = _cached_result(result, cache, min_length) or result
+                if result is None:
+                    exhausted = True
+                elif result.text is not None:
+                    pending.append((result._replace(strings=[result.text]), None))
+                elif result.strings is not None:
+                    pending.append((result, None))  # Served from the cache
                 else:
-                    print(f"       Hex (first 50): {const_data[:50].hex()}...")
+                    refs = []
+                    for piece in _split_for_workers(result.entry.data, chunk_size):
+                        refs.append((next_task, len(batch)))
+                        batch.append(piece)
+                        batch_bytes += len(piece[0])
+                        if batch_bytes >= chunk_size:
+                            futures[next_task] = executor.submit(_scan_pieces, batch, min_length)
+                            remaining[next_task] = len(batch)
+                            next_task += 1
+                            batch, batch_bytes = [], 0
+                    pending.append((result, refs))
+            
+            if batch and (exhausted or len(futures) >= max_in_flight
+                          or any(task == next_task for task, _ in pending[0][1] or ())):
+                futures[next_task] = executor.submit(_scan_pieces, batch, min_length)
+                remaining[next_task] = len(batch)
+                next_task += 1
+                batch, batch_bytes = [], 0
+            
+            # Hand back finished entries in order; block on the oldest only
+            # when the input is drained or the pool is saturated
+            while pending:
+                result, refs = pending[0]
+                if refs is None:
+                    pending.popleft()
+                    yield result
+                    continue
+                if any(task == next_task for task, _ in refs):
+                    break
+                if not (exhausted or len(futures) >= max_in_flight
+                        or all(futures[task].done() for task, _ in refs)):
+                    break
+                pending.popleft()
+                hits = []
+                for task, index in refs:
+                    hits.extend(futures[task].result()[index])
+                    remaining[task] -= 1
+                    if not remaining[task]:
+                        del futures[task], remaining[task]
+                result = _with_hits(result, hits, profiler=profiler)
+                _store_result(result, cache, min_length)
+                yield result
+
+def _entry_size(result):
+    return result.entry.length
+
+def _limits_strings(limits):
+    """Return True if limits drop or cap strings (not just entries)"""
+    return limits is not None and (limits.max_per_entry, limits.max_total, limits.categories,
+                                   limits.max_length) != (None, None, None, None)
+
+def _limit_entries(entries, limits):
+    """Drop table entries outside the entry number and size ranges of limits"""
+    if limits.entry_range is not None:
+        start, stop = limits.entry_range
+        entries = islice(entries, start or 0, stop)
+    if limits.size_range is not None:
+        low, high = limits.size_range
+        entries = (entry for entry in entries
+                   if (low is None or entry.length >= low) and (high is None or entry.length <= high))
+    return entries
+
+def _limit_total(results, max_total):
+    """Stop the pipeline once max_total distinct strings have been produced"""
+    seen = set()
+    for result in results:
+        if len(seen) + len(result.strings) >= max_total:
+            kept = set()
+            for s in result.strings:
+                if s in seen or len(seen) < max_total:
+                    seen.add(s)
+                    kept.add(s)
+            hits = result.hits and [hit for hit in result.hits if hit_string(hit) in kept]
+            yield result._replace(strings=[s for s in result.strings if s in kept], hits=hits)
+            if len(seen) >= max_total:
+                return
+            continue
+        seen.update(result.strings)
+        yield result
+
+def analyze_constants(data, count, offset, min_length=3, workers=None, cache=None, profiler=None,
+                      limits=None):
+    """Return the lazy table -> decode -> extract pipeline over a mapped file
+
+    With a profiler, each stage is timed (exclusive of the stages it pulls
+    from) with the bytes and number of entries that went through it. With
+    limits, entries outside the requested ranges are never decoded, and the
+    pipeline stops pulling entries once limits.max_total strings are found.
+    """
+    entries = iter_constant_table(data, count, offset)
+    if limits is not None:
+        entries = _limit_entries(entries, limits)
+    if len(data) < PARALLEL_CHUNK_SIZE:
+        workers = None  # Too small to be worth starting a pool
+    if profiler is None:
+        results = extract_constants(decode_constants(entries), min_length, workers, cache=cache, limits=limits)
+    else:
+        entries = profiler.iterate('table', entries, lambda entry: entry.length)
+        decoded = profiler.iterate('decode', decode_constants(entries), _entry_size)
+        results = profiler.iterate('extract', extract_constants(decoded, min_length, workers, cache=cache,
+                                                                profiler=profiler, limits=limits), _entry_size)
+    if limits is not None and limits.max_total is not None:
+        results = _limit_total(results, limits.max_total)
+    return results
+
+def _classify(table, profiler=None):
+    """classify_table, timed as the 'classify' stage with a profiler"""
+    if profiler is None:
+        return classify_table(table)
+    with profiler.stage('classify', items=len(table.strings)):
+        return classify_table(table)
+
+def new_string_table():
+    """Return an empty string table (see string_table.py)"""
+    from string_table import StringTable
+    return StringTable()
+
+def collect_strings(results, table):
+    """Yield results unchanged, adding every string hit to table with its entry and offset
+
+    Constants that decode directly as UTF-8 count as one 'direct_utf8' hit
+    at offset 0.
+    """
+    for result in results:
+        if result.text is not None:
+            table.extend(result.entry.index, [(s, 0, 'direct_utf8') for s in result.strings])
+        else:
+            table.extend(result.entry.index, [(hit_string(hit), hit.offset, hit.detector) for hit in result.hits])
+        yield result
+
+def open_watchlist(paths, cache_path=None):
+    """Load indicator watchlists (see watchlist.py)
+
+    The compiled automaton is cached at cache_path when one is given, and
+    compiled afresh otherwise.
+    """
+    from watchlist import Watchlist
+    return Watchlist.load(paths, cache_path)
+
+def _watch_constant(watchlist, entry, profiler=None):
+    """watchlist.scan_entry, timed as the 'watchlist' stage with a profiler"""
+    if profiler is None:
+        return watchlist.scan_entry(entry)
+    with profiler.stage('watchlist', entry.length, 1):
+        return watchlist.scan_entry(entry)
+
+def _print_watch_hits(hits, limit=100):
+    """Print watchlist hits as entry, offset in the entry, indicator and lists"""
+    print(f"\n[+] Watchlist hits ({len(hits)}):")
+    for hit in hits[:limit]:
+        print(f"  [{hit.entry:02}] +{hit.offset:<6} {repr(hit.indicator)} ({', '.join(hit.lists)})")
+    if len(hits) > limit:
+        print(f"  ... and {len(hits) - limit} more")
+
+def new_sketch():
+    """Return an empty MinHash fingerprint (see similarity.py)"""
+    from similarity import MinHash
+    return MinHash()
+
+def open_similarity_index(path):
+    """Open the LSH index of file fingerprints (see similarity.py)"""
+    from similarity import SimilarityIndex
+    return SimilarityIndex(path)
+
+def sketch_constants(results, sketch, table, profiler=None):
+    """Yield results unchanged, adding each constant and each new string of table to sketch
+
+    Chained after collect_strings, every distinct string is hashed once,
+    when it first appears.
+    """
+    strings = table.strings
+    seen = len(strings)
+    for result in results:
+        if profiler is None:
+            sketch.add_constant(result.entry.data)
+            if len(strings) > seen:
+                sketch.add_strings(strings[seen:])
+        else:
+            with profiler.stage('fingerprint', result.entry.length, 1):
+                sketch.add_constant(result.entry.data)
+                sketch.add_strings(strings[seen:])
+        seen = len(strings)
+        yield result
+
+def _print_constant(result):
+    """Print one analysed constant pool entry"""
+    const_data = result.entry.data
+    print(f"\n[{result.entry.index:02}] Length: {result.entry.length}")
+    
+    if result.text is not None:
+        if result.strings and result.text.strip():  # Only show non-empty strings
+            print(f"     Direct UTF-8: {repr(result.text)}")
+        else:
+            print(f"     Empty/whitespace string")
+    elif result.strings:
+        print(f"     Extracted strings: {result.strings}")
+    else:
+        # Show binary analysis
+        print(f"     Binary data ({len(const_data)} bytes):")
+        for info in result.binary_analysis:
+            print(f"       {info}")
+        if len(const_data) <= 50:
+            print(f"       Hex: {const_data.hex()}")
+        else:
+            print(f"       Hex (first 50): {const_data[:50].hex()}...")
+
+def decompile_bin(filepath, min_length=3, workers=None, cache=None, profiler=None, limits=None,
+                  watchlist=None):
+    # Constants are read straight from a read-only mapping of the file, so
+    # peak memory follows the largest constant rather than the whole file.
+    # With workers > 1, string extraction of large files runs in a process
+    # pool, and constants already in the cache are not re-extracted (see
+    # extract_constants). A profiler (see profiling.Profiler) collects
+    # per-stage statistics; limits (an ExtractionLimits) are pushed down
+    # into the pipeline (see analyze_constants). With a watchlist (see
+    # open_watchlist), the raw bytes of every constant are also matched
+    # against its indicators.
+    with map_bin_file(filepath) as data:
+        try:
+            const_count, offset = read_pool_header(data)
+        except ValueError as e:
+            print(e)
+            return
         
-        offset += length
+        print(f"[+] Magic Header OK: {data[0:4].hex()}")
+        print(f"[+] Constant Pool Entries: {const_count}")
+        
+        table = new_string_table()
+        watch_hits = []
+        results = analyze_constants(data, const_count, offset, min_length, workers, cache, profiler, limits)
+        for result in collect_strings(results, table):
+            if watchlist is not None:
+                watch_hits.extend(_watch_constant(watchlist, result.entry, profiler))
+            if _limits_strings(limits) and not result.strings:
+                continue  # Nothing left after filtering
+            _print_constant(result)
+
+    if watchlist is not None:
+        _print_watch_hits(watch_hits)
 
     # Print all unique strings found
-    unique_strings = list(set(all_strings))
+    unique_strings = table.strings
     if unique_strings:
         print(f"\n[+] All extracted strings ({len(unique_strings)}):")
-        for i, s in enumerate(sorted(unique_strings), 1):
+        for i, s in enumerate(table.sorted_strings(), 1):
             print(f"  {i:2}. {repr(s)}")
         
         # Categorize strings
         print(f"\n[+] String Analysis:")
-        categories = categorize_strings(unique_strings)
+        categories, functionality = _classify(table, profiler)
         
-        for category, items in categories.items():
-            if items:
-                print(f"\n  📋 {category.upper().replace('_', ' ')} ({len(items)}):")
-                for item in sorted(items)[:10]:  # Show first 10 items
-                    print(f"    - {repr(item)}")
-                if len(items) > 10:
-                    print(f"    ... and {len(items) - 10} more")
+        for category, ids in categories.items():
+            if ids:
+                print(f"\n  📋 {category.upper().replace('_', ' ')} ({len(ids)}):")
+                for string_id in heapq.nsmallest(10, ids, key=unique_strings.__getitem__):  # Show first 10 items
+                    print(f"    - {repr(unique_strings[string_id])}")
+                if len(ids) > 10:
+                    print(f"    ... and {len(ids) - 10} more")
         
         # Analyze functionality
         print(f"\n[+] Detected Functionality:")
-        functionality = analyze_functionality(unique_strings)
         for func in functionality:
             print(f"  {func}")
         
         # Show relationships
         print(f"\n[+] String Relationships:")
-        relationships = find_string_relationships(unique_strings)
+        if profiler is None:
+            relationships = find_string_relationships(unique_strings)
+        else:
+            with profiler.stage('relationships', items=len(unique_strings)):
+                relationships = find_string_relationships(unique_strings)
         for rel in relationships[:10]:  # Show first 10 relationships
             print(f"  {rel}")
         if len(relationships) > 10:
@@ -334,9 +1503,689 @@ def decompile_bin(filepath):
     print("\n[!] This tool shows constant pool and extracted strings.")
     print("[!] Full opcode decompilation requires V8 bytecode parser (complex).")
 
-if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: python nw_bin_decompiler.py <file.bin>")
-        sys.exit(1)
+OUTPUT_SCHEMA_VERSION = 1
+OUTPUT_FORMATS = ('text', 'json', 'ndjson')
+
+def constant_record(result):
+    """Return the output record of one analysed constant (see docs/output-format.md)"""
+    entry = result.entry
+    if result.text is not None:
+        kind = 'text'
+        found = [('direct_utf8', 0, text) for text in result.strings if text.strip()]
+    else:
+        kind = 'strings' if result.strings else 'binary'
+        found = [(hit.detector, hit.offset, hit.text) for hit in result.hits]
+    
+    masks = {}
+    functionality_bits = 0
+    strings = []
+    for detector, offset, text in found:
+        display = hit_string(StringHit(offset, detector, text))
+        if display not in masks:
+            masks[display] = keyword_masks(display)
+            functionality_bits |= masks[display][1]
+        strings.append({
+            'offset': offset,
+            'detector': detector,
+            'text': text,
+            'category': categorize_string(display, masks[display][0]),
+        })
+    record = {
+        'type': 'constant',
+        'index': entry.index,
+        'offset': entry.offset,
+        'length': entry.length,
+        'kind': kind,
+        'strings': strings,
+        'functionality': [label for bit, (label, _) in enumerate(FUNCTIONALITY_RULES)
+                          if functionality_bits & (1 << bit)],
+    }
+    if kind == 'binary':
+        record['binary_analysis'] = result.binary_analysis
+    return record
+
+def iter_output_records(filepath, min_length=3, workers=None, cache=None, profiler=None, limits=None):
+    """Yield one record per constant of a .bin file, then a summary record
+
+    Only the set of distinct strings is kept in memory, for the summary.
+    Errors end the stream with a summary whose 'valid' is false.
+    """
+    summary = {
+        'type': 'summary',
+        'schema_version': OUTPUT_SCHEMA_VERSION,
+        'path': filepath,
+        'valid': False,
+        'error': None,
+        'constant_count': 0,
+        'string_count': 0,
+        'categories': {},
+        'functionality': [],
+    }
+    seen = set()
+    category_counts = Counter()
+    functionality_bits = 0
+    try:
+        with map_bin_file(filepath) as data:
+            const_count, offset = read_pool_header(data)
+            summary['constant_count'] = const_count
+            for result in analyze_constants(data, const_count, offset, min_length, workers, cache, profiler,
+                                            limits):
+                for s in result.strings:
+                    if s not in seen:
+                        seen.add(s)
+                        category_bits, bits = keyword_masks(s)
+                        functionality_bits |= bits
+                        category = categorize_string(s, category_bits)
+                        if category is not None:
+                            category_counts[category] += 1
+                yield constant_record(result)
+        summary['valid'] = True
+    except (OSError, ValueError, IndexError) as e:
+        summary['error'] = str(e) or type(e).__name__
+    
+    summary['string_count'] = len(seen)
+    summary['categories'] = {category: category_counts[category]
+                             for category in CATEGORY_NAMES if category_counts[category]}
+    summary['functionality'] = [label for bit, (label, _) in enumerate(FUNCTIONALITY_RULES)
+                                if functionality_bits & (1 << bit)]
+    yield summary
+
+def write_records(records, fmt='ndjson', out=None):
+    """Stream records as NDJSON lines or as one JSON document
+
+    The json format writes {"constants": [...], "summary": {...}}; every
+    record except the summary goes into the constants list.
+    """
+    out = out or sys.stdout
+    if fmt == 'ndjson':
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return
+    out.write('{"constants": [')
+    separator = '\n'
+    summary = None
+    for record in records:
+        if record['type'] == 'summary':
+            summary = record
+            continue
+        out.write(separator + json.dumps(record, ensure_ascii=False))
+        separator = ',\n'
+    out.write('\n], "summary": ' + json.dumps(summary, ensure_ascii=False) + '}\n')
+
+def print_entropy_profile(filepath, window=ENTROPY_WINDOW, stride=None):
+    """Print the whole-file entropy profile as runs of similar windows"""
+    with map_bin_file(filepath) as data:
+        profile = entropy_profile(data, window, stride)
+        size = len(data)
+    
+    print(f"\n[+] Entropy profile ({window}-byte windows, stride {stride or window}):")
+    regions = []  # [start, end, high, min, max]
+    for offset, entropy in profile:
+        high = entropy >= HIGH_ENTROPY
+        if regions and regions[-1][2] == high and offset <= regions[-1][1]:
+            region = regions[-1]
+            region[1] = min(offset + window, size)
+            region[3] = min(region[3], entropy)
+            region[4] = max(region[4], entropy)
+        else:
+            regions.append([offset, min(offset + window, size), high, entropy, entropy])
+    for start, end, high, low, peak in regions:
+        label = "high (compressed/encrypted?)" if high else "normal"
+        print(f"  0x{start:08x}-0x{end:08x}  {low:.2f}-{peak:.2f} bits/byte  {label}")
+
+def iter_selected_constants(filepath, indexes, min_length=3, use_index=True, write_index=False):
+    """Yield analysed results for the given entry numbers only
+
+    Entries are located through the sidecar index when there is a current
+    one (see load_constant_index), so no other part of the table or file is
+    read; write_index saves one if needed. Raises ValueError for an entry
+    number outside the pool.
+    """
+    with map_bin_file(filepath) as data:
+        const_count, offset = read_pool_header(data)
+        for i in indexes:
+            if not 0 <= i < const_count:
+                raise ValueError(f"Entry {i} is out of range (the pool has {const_count} entries).")
+        if use_index:
+            index = load_constant_index(filepath, data, const_count, offset, write=write_index)
+        else:
+            index = read_constant_index(data, const_count, offset)
+        entries = (constant_entry(data, index, i) for i in indexes)
+        yield from extract_constants(decode_constants(entries), min_length)
+
+def _content_digests(data, index):
+    """Return {content digest: [entry numbers]} for every constant"""
+    from analysis_cache import constant_digest
+    digests = {}
+    for i, (offset, length) in enumerate(zip(index.offsets, index.lengths)):
+        digests.setdefault(constant_digest(data[offset:offset + length]), []).append(i)
+    return digests
+
+def _strings_of(data, index, entry_numbers, min_length, cache):
+    """Return the set of strings extracted from the given entries"""
+    entries = (constant_entry(data, index, i) for i in entry_numbers)
+    strings = set()
+    for result in extract_constants(decode_constants(entries), min_length, cache=cache):
+        strings.update(result.strings)
+    return strings
+
+def _shared_strings(data, index, entry_numbers, candidates, min_length, cache):
+    """Return (candidates also found in the given entries, bytes analysed)
 
-    decompile_bin(sys.argv[1])
+    Only entries that can hold a candidate are analysed. A plain string is
+    a substring of its constant, so one Aho-Corasick scan (see watchlist.py)
+    for the candidates' UTF-8 bytes picks those out; while tagged base64/hex
+    candidates remain, entries with base64 or hex runs are analysed too.
+    """
+    if not candidates:
+        return set(), 0
+    from watchlist import Watchlist
+    automaton = Watchlist.compile([('diff', [s.encode('utf-8', 'surrogatepass') for s in candidates])])
+    encoded = any(s.startswith(tuple(_DETECTOR_PREFIXES.values())) for s in candidates)
+    selected = []
+    for i in entry_numbers:
+        view = constant_entry(data, index, i).data
+        if automaton.scan(view) or (encoded and (_base64_hits(view, 0, len(view), min_length)
+                                                 or _hex_hits(view, 0, len(view), min_length))):
+            selected.append(i)
+    analysed = sum(index.lengths[i] for i in selected)
+    return candidates & _strings_of(data, index, selected, min_length, cache), analysed
+
+def diff_builds(old_path, new_path, min_length=3, cache=None):
+    """Compare two builds and return a JSON-serialisable diff report
+
+    Constants are matched by content hash, wherever they sit in the pool.
+    Only the unmatched ones are analysed: an unmatched entry number present
+    in both builds counts as changed, the rest as added or removed. Added
+    strings are those found in the new build's unmatched constants but not
+    in the old build's, and removed strings the reverse. Such a string may
+    still sit in a constant both builds share, so the shared constants that
+    can contain one are analysed as well (see _shared_strings); the work
+    follows the size of the change plus one hashing pass over both files.
+    Extra copies of a constant that the other build also has are counted
+    but not analysed: their strings exist on both sides.
+    """
+    with map_bin_file(old_path) as old_data, map_bin_file(new_path) as new_data:
+        old_count, old_offset = read_pool_header(old_data)
+        new_count, new_offset = read_pool_header(new_data)
+        old_index = read_constant_index(old_data, old_count, old_offset)
+        new_index = read_constant_index(new_data, new_count, new_offset)
+        
+        old_digests = _content_digests(old_data, old_index)
+        unmatched_old = []
+        unmatched_new = []
+        matched_new = []  # One new entry per constant the builds share
+        copies = set()  # (side, entry) of unmatched copies of shared content
+        unchanged = 0
+        for digest, numbers in _content_digests(new_data, new_index).items():
+            old_numbers = old_digests.pop(digest, ())
+            unchanged += min(len(numbers), len(old_numbers))
+            if old_numbers:
+                matched_new.append(numbers[0])
+            extra_new = numbers[len(old_numbers):]
+            extra_old = old_numbers[len(numbers):]
+            unmatched_new.extend(extra_new)
+            unmatched_old.extend(extra_old)
+            if old_numbers:
+                copies.update(('new', i) for i in extra_new)
+                copies.update(('old', i) for i in extra_old)
+        for numbers in old_digests.values():
+            unmatched_old.extend(numbers)
+        unmatched_old.sort()
+        unmatched_new.sort()
+        
+        to_analyse_old = [i for i in unmatched_old if ('old', i) not in copies]
+        to_analyse_new = [i for i in unmatched_new if ('new', i) not in copies]
+        analysed_bytes = (sum(old_index.lengths[i] for i in to_analyse_old)
+                          + sum(new_index.lengths[i] for i in to_analyse_new))
+        old_strings = _strings_of(old_data, old_index, to_analyse_old, min_length, cache)
+        new_strings = _strings_of(new_data, new_index, to_analyse_new, min_length, cache)
+        # Strings of shared constants are in both builds: neither added nor removed
+        old_strings, new_strings = old_strings - new_strings, new_strings - old_strings
+        shared, shared_bytes = _shared_strings(new_data, new_index, sorted(matched_new),
+                                               old_strings | new_strings, min_length, cache)
+        analysed_bytes += shared_bytes
+    
+    changed = sorted(set(unmatched_old).intersection(unmatched_new))
+    changed_set = set(changed)
+    added_strings = sorted(new_strings - shared)
+    removed_strings = sorted(old_strings - shared)
+    added_categories, added_functionality = classify_strings(added_strings)
+    removed_categories, removed_functionality = classify_strings(removed_strings)
+    return {
+        'old': old_path,
+        'new': new_path,
+        'old_constant_count': old_count,
+        'new_constant_count': new_count,
+        'unchanged_constants': unchanged,
+        'changed_constants': changed,
+        'added_constants': [i for i in unmatched_new if i not in changed_set],
+        'removed_constants': [i for i in unmatched_old if i not in changed_set],
+        'analysed_bytes': analysed_bytes,
+        'added_strings': {category: items for category, items in added_categories.items() if items},
+        'removed_strings': {category: items for category, items in removed_categories.items() if items},
+        'functionality_added': [label for label in added_functionality if label not in removed_functionality],
+        'functionality_removed': [label for label in removed_functionality if label not in added_functionality],
+    }
+
+def print_diff(diff):
+    """Print a diff_builds report"""
+    print(f"[+] Old: {diff['old']} ({diff['old_constant_count']} entries)")
+    print(f"[+] New: {diff['new']} ({diff['new_constant_count']} entries)")
+    print(f"[+] Constants: {diff['unchanged_constants']} unchanged, {len(diff['changed_constants'])} changed, "
+          f"{len(diff['added_constants'])} added, {len(diff['removed_constants'])} removed "
+          f"({diff['analysed_bytes']} bytes analysed)")
+    for label, key in (('Changed', 'changed_constants'), ('Added', 'added_constants'),
+                       ('Removed', 'removed_constants')):
+        numbers = diff[key]
+        if numbers:
+            shown = ', '.join(str(i) for i in numbers[:20])
+            more = f" ... and {len(numbers) - 20} more" if len(numbers) > 20 else ''
+            print(f"    {label} entries: {shown}{more}")
+    
+    for title, key, sign in (('Added strings', 'added_strings', '+'),
+                             ('Removed strings', 'removed_strings', '-')):
+        categories = diff[key]
+        print(f"\n[+] {title} ({sum(len(items) for items in categories.values())}):")
+        for category, items in categories.items():
+            print(f"\n  📋 {category.upper().replace('_', ' ')} ({len(items)}):")
+            for item in items:
+                print(f"    {sign} {repr(item)}")
+    
+    for title, key in (('Functionality gained', 'functionality_added'),
+                       ('Functionality lost', 'functionality_removed')):
+        if diff[key]:
+            print(f"\n[+] {title}:")
+            for func in diff[key]:
+                print(f"  {func}")
+
+def open_cache(path, max_bytes=DEFAULT_CACHE_BYTES):
+    """Open the on-disk analysis cache for this analyzer version"""
+    from analysis_cache import AnalysisCache
+    return AnalysisCache(path, namespace=ANALYZER_VERSION, max_bytes=max_bytes)
+
+def open_store(path):
+    """Open the corpus string store (see store.py)"""
+    from store import StringStore
+    return StringStore(path, categorize_string)
+
+def index_files(paths, store, min_length=3, workers=None, cache=None, profiler=None, limits=None):
+    """Add the strings of every file to store and yield each file's summary record"""
+    for path in paths:
+        yield store.add_records(path, iter_output_records(path, min_length, workers, cache, profiler, limits))
+
+def analyze_file(filepath, min_length=3, cache=None, profiler=None, limits=None, sketch=None):
+    """Analyse one .bin file and return a JSON-serialisable report dict
+
+    Errors are recorded in the report instead of raised, so one bad file
+    does not stop a batch. A sketch (see new_sketch) is filled with the
+    file's fingerprint as the constants stream past.
+    """
+    report = {
+        'path': filepath,
+        'valid': False,
+        'error': None,
+        'constant_count': 0,
+        'strings': [],
+        'categories': {},
+        'functionality': [],
+    }
+    table = new_string_table()
+    try:
+        with map_bin_file(filepath) as data:
+            const_count, offset = read_pool_header(data)
+            report['constant_count'] = const_count
+            results = analyze_constants(data, const_count, offset, min_length, cache=cache,
+                                        profiler=profiler, limits=limits)
+            results = collect_strings(results, table)
+            if sketch is not None:
+                results = sketch_constants(results, sketch, table, profiler)
+            for _ in results:
+                pass
+    except (OSError, ValueError, IndexError) as e:
+        report['error'] = str(e) or type(e).__name__
+        return report
+    
+    report['valid'] = True
+    report['strings'] = table.sorted_strings()
+    categories, functionality = _classify(table, profiler)
+    report['categories'] = {
+        category: table.sorted_strings(ids)
+        for category, ids in categories.items()
+        if ids
+    }
+    report['functionality'] = functionality
+    return report
+
+def iter_bin_paths(patterns):
+    """Expand files, directories (searched recursively for *.bin) and globs"""
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, '**', '*.bin'), recursive=True))
+        elif glob.has_magic(pattern):
+            matches = sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+        else:
+            matches = [pattern]
+        for path in matches:
+            if path not in seen:
+                seen.add(path)
+                yield path
+
+_WORKER_CACHES = {}
+
+def worker_cache(cache_path, cache_bytes=DEFAULT_CACHE_BYTES):
+    """Return this process's connection to the cache at cache_path, opening it once
+
+    For pool workers (batch mode, daemon.py). Returns None if the cache
+    cannot be opened (e.g. locked past the timeout): every constant is then
+    a miss instead of the file failing.
+    """
+    cache = _WORKER_CACHES.get(cache_path)
+    if cache is None:
+        try:
+            cache = _WORKER_CACHES[cache_path] = open_cache(cache_path, cache_bytes)
+        except sqlite3.Error:
+            return None
+    return cache
+
+def _analyze_file_task(filepath, min_length, cache_path, cache_bytes, profile=False, limits=None,
+                       fingerprint=False):
+    """Worker: analyze_file with a per-process cache connection
+
+    With profile, return (report, stage statistics) instead of the report.
+    With fingerprint, the report of a valid file gets a 'fingerprint' dict
+    (feature count and hex signature) to add to a similarity index.
+    """
+    profiler = None
+    if profile:
+        from profiling import Profiler
+        profiler = Profiler()
+    sketch = new_sketch() if fingerprint else None
+    cache = worker_cache(cache_path, cache_bytes) if cache_path is not None else None
+    if cache is None:
+        report = analyze_file(filepath, min_length, profiler=profiler, limits=limits, sketch=sketch)
+    else:
+        try:
+            report = analyze_file(filepath, min_length, cache, profiler, limits, sketch)
+        finally:
+            cache.commit()  # Pool workers exit without running cleanup handlers
+    if sketch is not None and report['valid']:
+        report['fingerprint'] = {'features': sketch.features, 'signature': sketch.digest().hex()}
+    return (report, profiler.report()) if profile else report
+
+def analyze_batch(paths, workers=None, min_length=3, chunksize=None,
+                  cache_path=None, cache_bytes=DEFAULT_CACHE_BYTES, profiler=None, limits=None,
+                  fingerprint=False):
+    """Yield analyze_file reports for many files, in input order
+
+    Files are spread over a process pool; with many small files they are
+    handed out in chunks to keep the per-task overhead low. workers=1 runs
+    everything in the current process. With cache_path, every worker shares
+    the same on-disk analysis cache. With a profiler, the stage statistics
+    of every file are merged into it. limits apply to each file separately.
+    fingerprint adds MinHash fingerprints to the reports (see
+    _analyze_file_task).
+    """
+    paths = list(paths)
+    workers = workers or os.cpu_count() or 1
+    profile = profiler is not None
+    if workers == 1 or len(paths) <= 1:
+        results = (_analyze_file_task(path, min_length, cache_path, cache_bytes, profile, limits, fingerprint)
+                   for path in paths)
+        yield from _merged_reports(results, profiler)
+        return
+    if chunksize is None:
+        chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_analyze_file_task, paths, repeat(min_length), repeat(cache_path),
+                               repeat(cache_bytes), repeat(profile), repeat(limits), repeat(fingerprint),
+                               chunksize=chunksize)
+        yield from _merged_reports(results, profiler)
+
+def _merged_reports(results, profiler):
+    """Yield reports from _analyze_file_task results, merging profiles into profiler"""
+    if profiler is None:
+        yield from results
+        return
+    for report, stages in results:
+        profiler.merge(stages)
+        yield report
+
+def _parse_range(text):
+    """argparse type for 'START:STOP' ranges with optional, non-negative ends"""
+    low, sep, high = text.partition(':')
+    try:
+        if not sep:
+            raise ValueError
+        bounds = (int(low) if low else None, int(high) if high else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected START:STOP, got {text!r}")
+    if any(bound is not None and bound < 0 for bound in bounds):
+        raise argparse.ArgumentTypeError(f"bounds must not be negative, got {text!r}")
+    return bounds
+
+def _positive_int(text):
+    """argparse type for counts that must be at least 1"""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number, got {text!r}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+def _limits_from_args(args):
+    """Return the ExtractionLimits requested on the command line, or None"""
+    limits = ExtractionLimits(
+        max_per_entry=args.max_strings_per_entry,
+        max_total=args.max_strings,
+        categories=frozenset(args.category) if args.category else None,
+        max_length=args.max_length,
+        entry_range=args.entry_range,
+        size_range=args.size_range,
+        decode_depth=args.decode_depth,
+        decode_budget=args.decode_budget if args.decode_depth else None,
+    )
+    return None if limits == ExtractionLimits() else limits
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Show the constant pool and extracted strings of NW.js .bin files.")
+    parser.add_argument('paths', nargs='+', metavar='path',
+                        help=".bin file; several files, directories or globs switch to batch mode")
+    parser.add_argument('-j', '--jobs', type=_positive_int, default=None,
+                        help="worker processes (default: all cores in batch mode, "
+                             "one for a single file)")
+    parser.add_argument('--min-length', type=int, default=3,
+                        help="minimum length of extracted strings (default: 3)")
+    parser.add_argument('--cache', metavar='FILE',
+                        help="SQLite file caching per-constant results across runs")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024), metavar='MB',
+                        help="evict least recently used cache entries above this size (default: 256)")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='text',
+                        help="output format: text for reading, json or ndjson with the "
+                             "schema in docs/output-format.md (default: text)")
+    parser.add_argument('--store', metavar='FILE',
+                        help="index the strings of every file into this SQLite corpus store "
+                             "(query it with store.py) instead of printing them")
+    parser.add_argument('--similarity-index', metavar='FILE',
+                        help="add a MinHash fingerprint of every file to this LSH index "
+                             "(query it with similarity.py); reports are printed as in batch mode")
+    parser.add_argument('--entry', type=int, action='append', metavar='N',
+                        help="only show constant pool entry N (repeatable); entries are found "
+                             "through a <file>.idx sidecar index if there is a current one")
+    parser.add_argument('--write-index', action='store_true',
+                        help="with --entry, write or refresh the <file>.idx sidecar index")
+    parser.add_argument('--no-index', action='store_true',
+                        help="with --entry, walk the table instead of using the sidecar index")
+    parser.add_argument('--max-strings-per-entry', type=_positive_int, metavar='N',
+                        help="stop scanning a constant after N distinct strings")
+    parser.add_argument('--max-strings', type=_positive_int, metavar='N',
+                        help="stop the whole analysis after N distinct strings")
+    parser.add_argument('--category', action='append', choices=CATEGORY_NAMES, metavar='NAME',
+                        help="keep only strings of this category (repeatable): " + ', '.join(CATEGORY_NAMES))
+    parser.add_argument('--max-length', type=_positive_int, metavar='N', help="drop strings longer than N characters")
+    parser.add_argument('--entry-range', type=_parse_range, metavar='START:STOP',
+                        help="only analyse entries START to STOP-1 (either side may be empty)")
+    parser.add_argument('--size-range', type=_parse_range, metavar='MIN:MAX',
+                        help="only analyse constants of MIN to MAX bytes (either side may be empty)")
+    parser.add_argument('--decode-depth', type=_positive_int, metavar='N',
+                        help="also look for base64/hex payloads inside decoded payloads, N levels deep")
+    parser.add_argument('--decode-budget', type=int, default=DEFAULT_DECODE_BUDGET, metavar='BYTES',
+                        help="with --decode-depth, rescan at most BYTES of decoded text per constant "
+                             "(default: 1 MiB)")
+    parser.add_argument('--diff', action='store_true',
+                        help="compare two builds (old.bin new.bin): only constants whose content "
+                             "changed are analysed")
+    parser.add_argument('--watchlist', action='append', metavar='FILE',
+                        help="report where indicators from FILE (one per line) occur in the raw "
+                             "constant bytes (repeatable)")
+    parser.add_argument('--watchlist-cache', metavar='FILE',
+                        help="keep the compiled watchlists in FILE and reuse them while the lists "
+                             "are unchanged (default: compile on every run)")
+    parser.add_argument('--entropy-profile', action='store_true',
+                        help="also print the sliding-window entropy of the whole file")
+    parser.add_argument('--entropy-window', type=_positive_int, default=ENTROPY_WINDOW, metavar='BYTES',
+                        help="entropy window size (default: 4096)")
+    parser.add_argument('--entropy-stride', type=_positive_int, default=None, metavar='BYTES',
+                        help="distance between entropy windows (default: the window size)")
+    parser.add_argument('--profile', nargs='?', const='table', choices=('table', 'json'),
+                        help="print per-stage time, bytes, counts and peak memory to stderr "
+                             "as a table (default) or JSON")
+    parser.add_argument('--profile-dump', metavar='FILE',
+                        help="also run cProfile and write pstats data to FILE")
+    args = parser.parse_args(argv)
+    if args.entropy_profile and args.format != 'text':
+        parser.error("--entropy-profile is only available with --format text")
+    if args.watchlist and args.format != 'text':
+        parser.error("--watchlist is only available with --format text")
+    if args.similarity_index and (args.store or args.diff or args.entry):
+        parser.error("--similarity-index cannot be combined with --store, --diff or --entry")
+    
+    if not (args.profile or args.profile_dump):
+        return _run(args)
+    from profiling import Profiler
+    profiler = Profiler(args.profile_dump)
+    profiler.start()
+    try:
+        return _run(args, profiler)
+    finally:
+        profiler.stop()
+        if args.profile == 'json':
+            print(profiler.to_json(), file=sys.stderr)
+        elif args.profile:
+            print(profiler.format_table(), file=sys.stderr)
+
+def _run(args, profiler=None):
+    """Carry out the command line of main"""
+    paths = args.paths
+    limits = _limits_from_args(args)
+    cache_bytes = args.cache_size * 1024 * 1024
+    batch = len(paths) > 1 or any(os.path.isdir(p) or glob.has_magic(p) for p in paths)
+    batch = batch or args.similarity_index is not None
+    watchlist = None
+    if args.watchlist:
+        if batch or args.store or args.diff or args.entry:
+            print("--watchlist takes a single .bin file", file=sys.stderr)
+            return 2
+        try:
+            watchlist = open_watchlist(args.watchlist, args.watchlist_cache)
+        except OSError as e:
+            print(e, file=sys.stderr)
+            return 1
+    if args.store:
+        # One writer: files are indexed in turn, each using the workers itself
+        cache = open_cache(args.cache, cache_bytes) if args.cache else None
+        try:
+            with open_store(args.store) as store:
+                summaries = index_files(iter_bin_paths(paths), store, args.min_length, args.jobs, cache,
+                                        profiler, limits)
+                for summary in summaries:
+                    print(json.dumps(summary, ensure_ascii=False), flush=True)
+        finally:
+            if cache is not None:
+                cache.close()
+        return 0
+    
+    if args.diff:
+        if len(paths) != 2:
+            print("--diff takes exactly two .bin files: old and new", file=sys.stderr)
+            return 2
+        cache = open_cache(args.cache, cache_bytes) if args.cache else None
+        try:
+            diff = diff_builds(paths[0], paths[1], args.min_length, cache)
+        except (OSError, ValueError, IndexError) as e:
+            print(e, file=sys.stderr)
+            return 1
+        finally:
+            if cache is not None:
+                cache.close()
+        if args.format == 'text':
+            print_diff(diff)
+        else:
+            print(json.dumps(diff, ensure_ascii=False))
+        return 0
+    
+    if args.entry:
+        if batch:
+            print("--entry takes a single .bin file", file=sys.stderr)
+            return 2
+        results = iter_selected_constants(paths[0], args.entry, args.min_length, not args.no_index,
+                                          args.write_index)
+        try:
+            if args.format == 'text':
+                for result in results:
+                    _print_constant(result)
+            else:
+                write_records((constant_record(result) for result in results), args.format)
+        except (OSError, ValueError, IndexError) as e:
+            print(e, file=sys.stderr)
+            return 1
+        return 0
+    
+    if not batch:
+        cache = open_cache(args.cache, cache_bytes) if args.cache else None
+        try:
+            if args.format != 'text':
+                records = iter_output_records(paths[0], args.min_length, args.jobs, cache, profiler, limits)
+                write_records(records, args.format)
+                return 0
+            decompile_bin(paths[0], args.min_length, args.jobs, cache, profiler, limits, watchlist)
+            if args.entropy_profile:
+                print_entropy_profile(paths[0], args.entropy_window, args.entropy_stride)
+        finally:
+            if cache is not None:
+                cache.close()
+        return 0
+    
+    # Batch mode: one JSON report per line in input order (a JSON array
+    # with --format json)
+    index = open_similarity_index(args.similarity_index) if args.similarity_index else None
+    try:
+        reports = analyze_batch(iter_bin_paths(paths), args.jobs, args.min_length,
+                                cache_path=args.cache, cache_bytes=cache_bytes, profiler=profiler,
+                                limits=limits, fingerprint=index is not None)
+        _print_reports(reports, args.format, index)
+    finally:
+        if index is not None:
+            index.close()
+    return 0
+
+def _print_reports(reports, fmt, index=None):
+    """Print batch reports as JSON lines (or one array), indexing their fingerprints"""
+    separator = '['
+    for report in reports:
+        fingerprint = report.pop('fingerprint', None)
+        if index is not None and fingerprint is not None:
+            index.add(report['path'], bytes.fromhex(fingerprint['signature']), fingerprint['features'])
+        if fmt == 'json':
+            print(separator, json.dumps(report, ensure_ascii=False), sep='\n', end='', flush=True)
+            separator = ','
+        else:
+            print(json.dumps(report, ensure_ascii=False), flush=True)
+    if fmt == 'json':
+        print('[]' if separator == '[' else '\n]')
+
+if __name__ == '__main__':
+    sys.exit(main())
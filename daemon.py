@@ -0,0 +1,487 @@
+# daemon.py
+"""Long-running analysis server with a warm worker pool
+
+Serves HTTP over a Unix socket or a localhost TCP port (asyncio). Worker
+processes are started once and kept, so interpreter start-up, detector
+regex compilation and the analysis cache connection are paid per worker
+instead of per file. Files submitted by every client go through one bounded
+queue: when it is full, a submitting request waits (and stops reading its
+connection) until the workers catch up. Results are streamed back as
+NDJSON, one line per file, in the order the files complete.
+
+    POST /analyze  {"paths": ["app.bin", "builds/"], "format": "report",
+                    "min_length": 3, "limits": {"max_total": 500}}
+    GET  /status   queue and worker counters
+
+The server has no authentication and reads any path the process user can
+read, so it only listens on loopback addresses unless --allow-remote is
+given.
+
+Start a server, then submit files to it:
+    python daemon.py --socket /tmp/nwbin.sock --cache analysis.db
+    python daemon.py --socket /tmp/nwbin.sock --submit builds/
+    curl --unix-socket /tmp/nwbin.sock -d '{"paths": ["app.bin"]}' http://localhost/analyze
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import ipaddress
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import app
+
+# report: the analyze_file report (as in batch mode); records: the records
+# of docs/output-format.md; text: the decompile_bin output
+RESULT_FORMATS = ('report', 'records', 'text')
+DEFAULT_QUEUE_SIZE = 256
+MAX_REQUEST_BYTES = 1 << 20
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large'}
+
+def _warm_worker(min_length):
+    """Pool initializer: compile the detectors and keyword tables before the first file"""
+    sample = b'\x00createHash\x00https://example.com/\x00aGVsbG8gd29ybGQ=\xff68656c6c6f\x00'
+    app.classify_strings(app.extract_strings_from_binary(sample, min_length))
+
+def _ping():
+    return os.getpid()
+
+def _run_job(path, fmt, min_length, cache_path, cache_bytes, limits):
+    """Worker: analyse one file and return its result in format fmt"""
+    cache = app.worker_cache(cache_path, cache_bytes) if cache_path else None
+    try:
+        if fmt == 'report':
+            return app.analyze_file(path, min_length, cache, limits=limits)
+        if fmt == 'records':
+            records = list(app.iter_output_records(path, min_length, cache=cache, limits=limits))
+            return {'path': path, 'error': records[-1]['error'], 'records': records}
+        output = io.StringIO()
+        error = None
+        try:
+            with contextlib.redirect_stdout(output):
+                app.decompile_bin(path, min_length, cache=cache, limits=limits)
+        except (OSError, ValueError, IndexError) as e:
+            error = str(e) or type(e).__name__
+        return {'path': path, 'error': error, 'output': output.getvalue()}
+    finally:
+        if cache is not None:
+            cache.commit()  # Pool workers exit without running cleanup handlers
+
+def _shutdown(executor):
+    """Shut a process pool down, dropping calls not started yet where Python can (3.9+)"""
+    try:
+        executor.shutdown(wait=True, cancel_futures=True)
+    except TypeError:
+        executor.shutdown(wait=True)
+
+class _HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def _parse_limits(value):
+    """Return the ExtractionLimits of a request's "limits" object, or None"""
+    if value is None:
+        return None
+    if not isinstance(value, dict):
+        raise _HTTPError(400, "limits must be an object")
+    unknown = set(value) - set(app.ExtractionLimits._fields)
+    if unknown:
+        raise _HTTPError(400, f"unknown limits: {', '.join(sorted(unknown))}")
+    fields = dict(value)
+    for name in ('max_per_entry', 'max_total', 'max_length'):
+        if fields.get(name) is not None and (not isinstance(fields[name], int) or fields[name] < 1):
+            raise _HTTPError(400, f"{name} must be a positive integer")
+    depth = fields.get('decode_depth')
+    if depth is not None and (not isinstance(depth, int) or depth < 0):
+        raise _HTTPError(400, "decode_depth must be a non-negative integer")
+    for name in ('entry_range', 'size_range'):
+        if fields.get(name) is not None:
+            bounds = fields[name]
+            if (not isinstance(bounds, list) or len(bounds) != 2
+                    or any(bound is not None and (not isinstance(bound, int) or bound < 0) for bound in bounds)):
+                raise _HTTPError(400, f"{name} must be [start, stop] with non-negative integers or null")
+            fields[name] = tuple(bounds)
+    if fields.get('categories') is not None:
+        fields['categories'] = frozenset(fields['categories'])
+        if not fields['categories'] <= set(app.CATEGORY_NAMES):
+            raise _HTTPError(400, f"categories must be among: {', '.join(app.CATEGORY_NAMES)}")
+    if fields.get('decode_depth') and fields.get('decode_budget') is None:
+        fields['decode_budget'] = app.DEFAULT_DECODE_BUDGET
+    limits = app.ExtractionLimits(**fields)
+    return None if limits == app.ExtractionLimits() else limits
+
+async def _read_request(reader):
+    """Return (method, path, body) of one HTTP/1.1 request, or None at EOF"""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode('latin-1').split(' ', 2)
+        length = 0
+        while True:
+            header = await reader.readline()
+            if header in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = header.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+    except ValueError:
+        raise _HTTPError(400, "malformed request")
+    if length > MAX_REQUEST_BYTES:
+        raise _HTTPError(413, f"request body over {MAX_REQUEST_BYTES} bytes")
+    body = await reader.readexactly(length) if length > 0 else b''
+    return method, target.partition('?')[0], body
+
+def _head(status, content_type, extra=''):
+    return (f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+            f"{extra}Connection: close\r\n\r\n").encode('latin-1')
+
+async def _send_json(writer, status, value):
+    body = json.dumps(value, ensure_ascii=False).encode('utf-8') + b'\n'
+    writer.write(_head(status, 'application/json', f"Content-Length: {len(body)}\r\n") + body)
+    await writer.drain()
+
+class _Submission:
+    """Results of one /analyze request, filled in by the dispatchers"""
+    __slots__ = ('results', 'closed')
+
+    def __init__(self):
+        self.results = asyncio.Queue()
+        self.closed = False  # Set when the client is gone: its queued files are skipped
+
+class AnalysisServer:
+    """asyncio HTTP front end feeding a persistent process pool
+
+    One dispatcher task per worker takes files from the shared queue of at
+    most queue_size files, so no more than workers files are in the pool at
+    once. A worker process that dies breaks the whole pool, failing every
+    file running in it: the pool is replaced and each of those files is
+    retried once in a process of its own, so a file that crashes its
+    worker fails while the files that merely shared the pool with it still
+    get their results.
+    """
+
+    def __init__(self, workers=None, queue_size=DEFAULT_QUEUE_SIZE, cache_path=None,
+                 cache_bytes=app.DEFAULT_CACHE_BYTES, min_length=3):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.cache_path = cache_path
+        self.cache_bytes = cache_bytes
+        self.min_length = min_length
+        self.started = time.time()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self._queue = None
+        self._executor = None
+        self._dispatchers = []
+        self._handlers = set()
+        self._server = None
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker,
+                                   initargs=(self.min_length,))
+
+    async def start(self, socket_path=None, host='127.0.0.1', port=0):
+        """Start the workers, wait until they are warm and begin accepting requests"""
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(self.queue_size)
+        self._executor = self._new_executor()
+        # One call per worker makes the pool start all of them now
+        await asyncio.gather(*(loop.run_in_executor(self._executor, _ping) for _ in range(self.workers)))
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        if socket_path:
+            self._server = await asyncio.start_unix_server(self._handle, socket_path)
+            os.chmod(socket_path, 0o600)  # The server reads any file its user can
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    def address(self):
+        """Return the socket path or (host, port) the server listens on"""
+        return self._server.sockets[0].getsockname()
+
+    def status(self):
+        """Return the queue and worker counters"""
+        return {
+            'workers': self.workers,
+            'queued': self._queue.qsize(),
+            'queue_size': self.queue_size,
+            'running': self.running,
+            'completed': self.completed,
+            'failed': self.failed,
+            'uptime': round(time.time() - self.started, 3),
+        }
+
+    async def close(self):
+        """Stop accepting requests, drop open ones and shut the workers down"""
+        if self._server is not None:
+            self._server.close()
+        for task in self._dispatchers + list(self._handlers):
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, *self._handlers, return_exceptions=True)
+        if self._executor is not None:
+            # Waiting for the workers would block the event loop
+            await asyncio.get_running_loop().run_in_executor(None, _shutdown, self._executor)
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            path, options, submission = await self._queue.get()
+            try:
+                if submission.closed:
+                    continue
+                self.running += 1
+                try:
+                    result = await self._run(loop, path, options)
+                finally:
+                    self.running -= 1
+                self.completed += 1
+                if result.get('error'):
+                    self.failed += 1
+                submission.results.put_nowait(result)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, loop, path, options):
+        """Run one job in the pool; if the pool breaks, retry the job once on its own"""
+        executor = self._executor
+        try:
+            return await loop.run_in_executor(executor, _run_job, path, *options)
+        except BrokenProcessPool:
+            if self._executor is executor:
+                self._executor = self._new_executor()
+                executor.shutdown(wait=False)
+        except Exception as e:  # A result that failed to pickle, for one
+            return {'path': path, 'error': str(e) or type(e).__name__}
+        # Any file running in the pool fails when one worker dies; the retry
+        # gets a one-off process so a second crash takes down only this file
+        retry = ProcessPoolExecutor(max_workers=1)
+        try:
+            return await loop.run_in_executor(retry, _run_job, path, *options)
+        except BrokenProcessPool:
+            return {'path': path, 'error': "worker process died"}
+        except Exception as e:
+            return {'path': path, 'error': str(e) or type(e).__name__}
+        finally:
+            retry.shutdown(wait=False)
+
+    async def _submit(self, paths, options, submission):
+        for path in paths:
+            await self._queue.put((path, options, submission))  # Waits while the queue is full
+
+    def _request_options(self, body):
+        """Return (path patterns, job options) of an /analyze request body"""
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            raise _HTTPError(400, "body must be a JSON object")
+        if not isinstance(request, dict):
+            raise _HTTPError(400, "body must be a JSON object")
+        patterns = request.get('paths')
+        if not patterns or not isinstance(patterns, list) or not all(isinstance(p, str) for p in patterns):
+            raise _HTTPError(400, "paths must be a non-empty list of strings")
+        fmt = request.get('format', 'report')
+        if fmt not in RESULT_FORMATS:
+            raise _HTTPError(400, f"format must be one of: {', '.join(RESULT_FORMATS)}")
+        min_length = request.get('min_length', self.min_length)
+        if not isinstance(min_length, int) or min_length < 1:
+            raise _HTTPError(400, "min_length must be a positive integer")
+        try:
+            limits = _parse_limits(request.get('limits'))
+        except (TypeError, ValueError):
+            raise _HTTPError(400, "malformed limits")
+        return patterns, (fmt, min_length, self.cache_path, self.cache_bytes, limits)
+
+    async def _analyze(self, body, writer):
+        patterns, options = self._request_options(body)
+        loop = asyncio.get_running_loop()
+        paths = await loop.run_in_executor(None, lambda: list(app.iter_bin_paths(patterns)))
+        submission = _Submission()
+        feeder = asyncio.create_task(self._submit(paths, options, submission))
+        try:
+            writer.write(_head(200, 'application/x-ndjson', "Transfer-Encoding: chunked\r\n"))
+            for _ in paths:
+                result = await submission.results.get()
+                line = json.dumps(result, ensure_ascii=False).encode('utf-8') + b'\n'
+                writer.write(b'%x\r\n%s\r\n' % (len(line), line))
+                await writer.drain()  # A slow reader holds back its own stream only
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+        finally:
+            submission.closed = True
+            feeder.cancel()
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            request = await _read_request(reader)
+            if request is None:
+                return
+            method, target, body = request
+            if target not in ('/analyze', '/status'):
+                raise _HTTPError(404, f"no such endpoint: {target}")
+            if target == '/status':
+                if method != 'GET':
+                    raise _HTTPError(405, "use GET /status")
+                await _send_json(writer, 200, self.status())
+            elif method != 'POST':
+                raise _HTTPError(405, "use POST /analyze")
+            else:
+                await self._analyze(body, writer)
+        except _HTTPError as e:
+            with contextlib.suppress(ConnectionError):
+                await _send_json(writer, e.status, {'error': str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # Client went away
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+
+def _remove_stale_socket(path):
+    """Delete a socket file left by a server that is no longer running"""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise OSError(f"a server is already listening on {path}")
+    finally:
+        probe.close()
+
+async def serve(socket_path=None, host='127.0.0.1', port=0, **options):
+    """Run an AnalysisServer until SIGINT or SIGTERM; options go to AnalysisServer"""
+    server = AnalysisServer(**options)
+    if socket_path:
+        _remove_stale_socket(socket_path)
+    await server.start(socket_path, host, port)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(signum, stop.set)
+    print(f"[+] Listening on {server.address()} with {server.workers} warm workers", file=sys.stderr, flush=True)
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+        if socket_path:
+            with contextlib.suppress(OSError):
+                os.unlink(socket_path)
+
+def _is_loopback(host):
+    """Return True if every address host resolves to is a loopback address"""
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except socket.gaierror:
+        return False
+    return bool(infos) and all(ipaddress.ip_address(info[4][0].partition('%')[0]).is_loopback
+                               for info in infos)
+
+def submit(paths, socket_path=None, host='127.0.0.1', port=None, fmt='report', min_length=None, limits=None):
+    """Send paths to a running server and yield each file's result as it completes
+
+    limits is a dict of ExtractionLimits fields. Raises ValueError when the
+    server rejects the request.
+    """
+    request = {'paths': list(paths), 'format': fmt}
+    if min_length is not None:
+        request['min_length'] = min_length
+    if limits:
+        request['limits'] = limits
+    body = json.dumps(request).encode('utf-8')
+    if socket_path:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path)
+    else:
+        sock = socket.create_connection((host, port))
+    with sock, sock.makefile('rb') as stream:
+        sock.sendall(b'POST /analyze HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                     b'Content-Length: %d\r\nConnection: close\r\n\r\n%s' % (len(body), body))
+        status = int(stream.readline().split()[1])
+        while stream.readline() not in (b'\r\n', b'\n', b''):
+            pass
+        if status != 200:
+            raise ValueError(json.loads(stream.read() or b'{}').get('error') or f"HTTP {status}")
+        pending = b''
+        while True:
+            size = int(stream.readline().split(b';')[0], 16)
+            if not size:
+                break
+            pending += stream.read(size)
+            stream.readline()
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                yield json.loads(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve .bin analysis from a warm worker pool, or submit files to a running server.")
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument('--socket', metavar='PATH', help="Unix socket to listen on / connect to")
+    where.add_argument('--port', type=int, help="localhost TCP port to listen on / connect to")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="address for --port (default: 127.0.0.1); only loopback addresses "
+                             "are served unless --allow-remote is given")
+    parser.add_argument('--allow-remote', action='store_true',
+                        help="serve on a non-loopback --host. There is no authentication: anyone "
+                             "who can connect can read every file this user can read")
+    parser.add_argument('--submit', nargs='+', metavar='PATH',
+                        help="submit .bin files, directories or globs and print the results")
+    parser.add_argument('--format', choices=RESULT_FORMATS, default='report',
+                        help="with --submit: result format (default: report)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="worker processes (default: all cores)")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE, metavar='N',
+                        help="files waiting for a worker before submissions wait (default: 256)")
+    parser.add_argument('--min-length', type=int, default=3,
+                        help="default minimum length of extracted strings (default: 3)")
+    parser.add_argument('--cache', metavar='FILE',
+                        help="SQLite file caching per-constant results, shared by the workers")
+    parser.add_argument('--cache-size', type=int, default=app.DEFAULT_CACHE_BYTES // (1024 * 1024), metavar='MB',
+                        help="evict least recently used cache entries above this size (default: 256)")
+    args = parser.parse_args(argv)
+
+    if args.submit:
+        try:
+            for result in submit(args.submit, args.socket, args.host, args.port, args.format):
+                if args.format == 'text':
+                    print(f"==> {result['path']} <==")
+                    print(result.get('output') or result['error'], flush=True)
+                else:
+                    print(json.dumps(result, ensure_ascii=False), flush=True)
+        except (OSError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return 1
+        return 0
+
+    if args.port is not None and not args.allow_remote and not _is_loopback(args.host):
+        parser.error(f"{args.host} is not a loopback address; the server has no authentication and "
+                     f"would let the network read this user's files (pass --allow-remote to do so anyway)")
+    try:
+        asyncio.run(serve(args.socket, args.host, args.port or 0, workers=args.jobs,
+                          queue_size=args.queue_size, cache_path=args.cache,
+                          cache_bytes=args.cache_size * 1024 * 1024, min_length=args.min_length))
+    except OSError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark ของ NWBinAnalyzer ด้วยไฟล์ .bin สังเคราะห์ขนาดใกล้เคียงของจริง
+
+สร้างไฟล์ตามพารามิเตอร์ (จำนวน entry, ขนาด constant, สัดส่วนชนิด payload)
+แล้วจับเวลาแต่ละ stage พร้อม throughput (MB/s) และ peak RSS
+ถ้าใส่ --output ผลลัพธ์จะต่อท้ายไฟล์ JSON Lines นั้นเพื่อเปรียบเทียบกับการรันครั้งก่อน
+
+    python benchmark.py --preset medium --output results.jsonl
+    python benchmark.py --entries 1000 --size 65536 --mix utf8=1,binary=1,base64=1
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app
+from create_sample import write_varint
+from profiling import Profiler
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# (จำนวน entry, ขนาดต่อ constant เป็น bytes)
+PRESETS = {
+    'tiny': (10, 64),
+    'small': (1000, 1024),
+    'medium': (10_000, 4096),
+    'many': (1_000_000, 32),
+    'large-constant': (1, 100 * 1024 * 1024),
+}
+PAYLOAD_KINDS = ('utf8', 'binary', 'base64', 'hex', 'prefixed')
+DEFAULT_MIX = 'utf8=4,binary=2,base64=1,hex=1,prefixed=2'
+STAGES = ('table', 'decode', 'scan_strings', 'detectors', 'binary_structure',
+          'entropy', 'categorize', 'relationships')
+# entropy_profile ทั้งไฟล์: stride ที่หาร window ลงตัว และที่ไม่ลงตัว (gcd เล็ก)
+ENTROPY_STRIDES = (app.ENTROPY_WINDOW // 4, 1000)
+
+_WORDS = [
+    'require', 'module', 'exports', 'createHash', 'readFileSync', 'verifySignature',
+    'node:crypto', 'https://api.example.com/v1/', 'function', 'return', 'const',
+    'Buffer.from', 'Invalid signature', 'config.json', 'worker.js', 'process.env',
+    'ทดสอบ', 'ข้อความ', 'sha256', 'aes-128-gcm', 'localhost:3000', 'error', 'x', 'i',
+]
+_TEXT_BLOCK = 64 * 1024
+# relationships จับเวลาทั้งที่ limit ปกติ (20) และที่ limit ใหญ่ ซึ่งต้องไล่ strings ทั้งหมด
+RELATIONSHIP_LIMIT = 1_000_000
+
+def _text(rng, size):
+    """ข้อความคล้าย JavaScript (UTF-8 ที่ถูกต้อง) ขนาดประมาณ size bytes"""
+    if size > _TEXT_BLOCK:
+        block = _text(rng, _TEXT_BLOCK)
+        data = block * (size // len(block) + 1)
+    else:
+        words = []
+        length = 0
+        while length < size:
+            word = rng.choice(_WORDS)
+            words.append(word)
+            length += len(word.encode('utf-8')) + 1
+        data = ' '.join(words).encode('utf-8')
+    return data[:size].decode('utf-8', 'ignore').encode('utf-8')
+
+def _random_bytes(rng, size):
+    """bytes สุ่ม size ตัว (Random.randbytes มีตั้งแต่ Python 3.9)"""
+    return rng.getrandbits(8 * size).to_bytes(size, 'little') if size else b''
+
+def _embedded(rng, size, encode):
+    """binary แบบสุ่มที่มี string ฝังอยู่ (encode แปลงข้อความเป็น bytes ที่ฝัง)"""
+    pieces = []
+    length = 0
+    while length < size:
+        piece = _random_bytes(rng, rng.randint(4, 64)) + b'\x00' + encode(rng.choice(_WORDS).encode('utf-8'))
+        pieces.append(piece)
+        length += len(piece)
+    return b''.join(pieces)[:size]
+
+def _prefixed(word):
+    return bytes([len(word)]) + word
+
+_PAYLOADS = {
+    'utf8': _text,
+    'binary': _random_bytes,
+    'base64': lambda rng, size: _embedded(rng, size, base64.b64encode),
+    'hex': lambda rng, size: _embedded(rng, size, lambda word: word.hex().encode('ascii')),
+    'prefixed': lambda rng, size: _embedded(rng, size, _prefixed),
+}
+
+def parse_mix(text):
+    """แปลง 'utf8=4,binary=1' เป็น (kinds, weights)"""
+    kinds, weights = [], []
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in _PAYLOADS:
+            raise ValueError(f"unknown payload kind: {kind} (choose from {', '.join(PAYLOAD_KINDS)})")
+        kinds.append(kind)
+        weights.append(float(weight or 1))
+    return kinds, weights
+
+def generate_bin(path, entries, size, mix=DEFAULT_MIX, seed=0):
+    """เขียนไฟล์ .bin สังเคราะห์ทีละ constant (ไม่ถือทั้งไฟล์ไว้ในหน่วยความจำ)
+
+    constant ขนาดเกิน 1 MB ใช้ payload ก้อนเดียวกันซ้ำ เพื่อให้สร้างไฟล์ได้เร็ว
+    """
+    rng = random.Random(seed)
+    kinds, weights = parse_mix(mix)
+    cached = {}
+    with open(path, 'wb') as f:
+        f.write(app.MAGIC)
+        f.write(write_varint(entries))
+        for _ in range(entries):
+            kind = rng.choices(kinds, weights)[0]
+            if size > 1024 * 1024:
+                if kind not in cached:
+                    cached[kind] = _PAYLOADS[kind](rng, size)
+                payload = cached[kind]
+            else:
+                payload = _PAYLOADS[kind](rng, size)
+            f.write(write_varint(len(payload)))
+            f.write(payload)
+    return os.path.getsize(path)
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # macOS รายงานเป็น bytes
+
+def _measure(stage, func, nbytes):
+    """รัน func (คืนจำนวน item ที่ประมวลผล) แล้วคืนผลการจับเวลา"""
+    start = time.perf_counter()
+    items = func()
+    seconds = time.perf_counter() - start
+    return {
+        'stage': stage,
+        'seconds': round(seconds, 6),
+        'bytes': nbytes,
+        'items': items,
+        'mb_per_s': round(nbytes / seconds / 1e6, 3) if nbytes and seconds else None,
+        'peak_rss_kb': _peak_rss_kb(),
+    }
+
+def _count(iterable):
+    return sum(1 for _ in iterable)
+
+def _profiled(stats):
+    """ผลของ stage หนึ่งจาก Profiler ในรูปแบบเดียวกับ _measure"""
+    result = stats.as_dict()
+    del result['calls']
+    result['peak_rss_kb'] = _peak_rss_kb()
+    return result
+
+def run_benchmark(path, min_length=3, stages=STAGES):
+    """จับเวลาแต่ละ stage กับไฟล์ path และคืน list ของผลลัพธ์"""
+    results = []
+    with app.map_bin_file(path) as data:
+        count, offset = app.read_pool_header(data)
+        index = None
+
+        def walk_table():
+            nonlocal index
+            index = app.read_constant_index(data, count, offset)
+            return len(index.offsets)
+
+        # ตาราง entry ต้องใช้กับ stage อื่น จึงรันเสมอ
+        results.append(_measure('table', walk_table, len(data)))
+        offsets, lengths = index
+        total = sum(lengths)
+        binary, text = [], []
+        for i in range(len(offsets)):
+            (text if _is_utf8(data, offsets[i], lengths[i]) else binary).append(i)
+        binary_bytes = sum(lengths[i] for i in binary)
+
+        def constants(indexes=None):
+            for i in range(len(offsets)) if indexes is None else indexes:
+                yield data[offsets[i]:offsets[i] + lengths[i]]
+
+        if 'decode' in stages:
+            results.append(_measure('decode', lambda: _count(
+                app.decode_constants(app.iter_constant_table(data, count, offset))), total))
+
+        strings = {}
+
+        def scan():
+            hits = 0
+            for view in constants(binary):
+                for hit in app.scan_strings(view, min_length):
+                    strings.setdefault(app.hit_string(hit), None)
+                    hits += 1
+            return hits
+
+        if 'scan_strings' in stages or 'categorize' in stages or 'relationships' in stages:
+            results.append(_measure('scan_strings', scan, binary_bytes))
+        if 'detectors' in stages:
+            # เวลาของ detector แต่ละตัวภายใน pass เดียวของ scan_strings ตามที่ profiler บันทึก
+            profiler = Profiler()
+            for view in constants(binary):
+                for _ in app.scan_strings(view, min_length, profiler):
+                    pass
+            results.extend(_profiled(stats) for stats in profiler.stages.values())
+        if 'binary_structure' in stages:
+            results.append(_measure('binary_structure', lambda: _count(
+                app.analyze_binary_structure(view) for view in constants(binary)), binary_bytes))
+        if 'entropy' in stages:
+            for stride in ENTROPY_STRIDES:
+                results.append(_measure(f'entropy:stride={stride}', lambda: len(
+                    app.entropy_profile(data, app.ENTROPY_WINDOW, stride)), len(data)))
+
+        # Strings ที่ decompile_bin จะนำไปจัดหมวดหมู่: constant ที่เป็นข้อความ + strings ที่แยกได้
+        unique = list(dict.fromkeys([str(view, 'utf-8') for view in constants(text)] + list(strings)))
+        unique_bytes = sum(len(s.encode('utf-8')) for s in unique)
+        if 'categorize' in stages:
+            results.append(_measure('categorize', lambda: sum(
+                len(items) for items in app.categorize_strings(unique).values()), unique_bytes))
+        if 'relationships' in stages:
+            results.append(_measure('relationships', lambda: len(app.find_string_relationships(unique)),
+                                    unique_bytes))
+            results.append(_measure('relationships:large', lambda: len(
+                app.find_string_relationships(unique, RELATIONSHIP_LIMIT)), unique_bytes))
+    return results
+
+def _is_utf8(data, offset, length):
+    try:
+        str(data[offset:offset + length], 'utf-8')
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def previous_run(output, params):
+    """คืนผลการรันล่าสุดใน output ที่ใช้พารามิเตอร์เดียวกัน"""
+    if not os.path.exists(output):
+        return None
+    last = None
+    with open(output, encoding='utf-8') as f:
+        for line in f:
+            run = json.loads(line)
+            if run.get('params') == params:
+                last = run
+    return last
+
+def print_results(results, previous=None):
+    before = {r['stage']: r for r in previous['stages']} if previous else {}
+    print(f"\n{'stage':26} {'seconds':>10} {'MB/s':>10} {'items':>10} {'peak RSS KB':>12}  vs previous")
+    for r in results:
+        old = before.get(r['stage'])
+        change = f"{old['seconds'] / r['seconds']:.2f}x" if old and r['seconds'] else ''
+        mb_per_s = f"{r['mb_per_s']:.2f}" if r['mb_per_s'] is not None else '-'
+        print(f"{r['stage']:26} {r['seconds']:10.4f} {mb_per_s:>10} {r['items']:>10} "
+              f"{r['peak_rss_kb'] or '-':>12}  {change}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark NWBinAnalyzer stages on synthetic .bin files.")
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small',
+                        help="entry count and constant size (default: small)")
+    parser.add_argument('--entries', type=int, help="number of constant pool entries (overrides preset)")
+    parser.add_argument('--size', type=int, help="bytes per constant (overrides preset)")
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f"payload weights, kinds: {', '.join(PAYLOAD_KINDS)} (default: {DEFAULT_MIX})")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-length', type=int, default=3)
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help="comma-separated stages to time (default: all)")
+    parser.add_argument('--output', metavar='FILE',
+                        help="append the run to this JSON Lines file and compare with the last run "
+                             "in it that used the same parameters (default: print only)")
+    parser.add_argument('--keep', metavar='PATH', help="keep the generated .bin file at PATH")
+    args = parser.parse_args(argv)
+
+    entries, size = PRESETS[args.preset]
+    params = {
+        'entries': args.entries or entries,
+        'size': args.size or size,
+        'mix': args.mix,
+        'seed': args.seed,
+        'min_length': args.min_length,
+    }
+    stages = args.stages.split(',')
+
+    path = args.keep or os.path.join(tempfile.mkdtemp(prefix='nwbench-'), 'bench.bin')
+    print(f"🏗️  สร้างไฟล์ {params['entries']} entries x {params['size']} bytes ({params['mix']})...")
+    start = time.perf_counter()
+    file_size = generate_bin(path, params['entries'], params['size'], params['mix'], params['seed'])
+    print(f"   {file_size / 1e6:.1f} MB ใน {time.perf_counter() - start:.1f}s")
+
+    try:
+        results = run_benchmark(path, args.min_length, stages)
+    finally:
+        if not args.keep:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+
+    previous = previous_run(args.output, params) if args.output else None
+    print_results(results, previous)
+    if not args.output:
+        return 0
+    run = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'analyzer_version': app.ANALYZER_VERSION,
+        'params': params,
+        'file_bytes': file_size,
+        'stages': results,
+    }
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run, ensure_ascii=False) + '\n')
+    print(f"\n💾 บันทึกผลลงใน {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
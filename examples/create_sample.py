@@ -17,8 +17,8 @@ def write_varint(value):
     result += bytes([value & 0x7F])
     return result
 
-def create_simple_bin():
-    """สร้างไฟล์ binary ตัวอย่างขนาดเล็ก"""
+def create_simple_bin(path='test_simple.bin'):
+    """สร้างไฟล์ binary ตัวอย่างขนาดเล็กที่ path"""
     
     # Magic header สำหรับ NW.js
     data = b'\x8e\x06\xde\xc0'
@@ -42,10 +42,10 @@ def create_simple_bin():
         data += string_bytes
     
     # บันทึกไฟล์
-    with open('test_simple.bin', 'wb') as f:
+    with open(path, 'wb') as f:
         f.write(data)
     
-    print(f"✅ สร้างไฟล์ test_simple.bin สำเร็จ ({len(data)} bytes)")
+    print(f"✅ สร้างไฟล์ {path} สำเร็จ ({len(data)} bytes)")
 
 def create_complex_bin():
     """สร้างไฟล์ binary ตัวอย่างที่ซับซ้อนขึ้น"""
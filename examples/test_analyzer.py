@@ -7,24 +7,75 @@
 
 import sys
 import os
+import base64
 
 # เพิ่มโฟลเดอร์หลักเข้าไปใน path เพื่อ import app.py
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+EXAMPLES_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(EXAMPLES_DIR))
+sys.path.insert(0, EXAMPLES_DIR)  # create_sample
 
 try:
     from app import (
         read_varint, 
         extract_strings_from_binary,
+        scan_strings,
+        nested_payloads,
+        hit_string,
         analyze_binary_structure,
         categorize_strings,
         find_string_relationships,
-        analyze_functionality
+        analyze_functionality,
+        iter_constants,
+        decode_constants,
+        extract_constants,
+        iter_output_records,
+        analyze_file,
+        new_string_table,
+        collect_strings,
+        classify_table,
+        new_sketch,
+        map_bin_file,
+        read_pool_header,
+        read_constant_index,
+        constant_entry,
+        diff_builds,
+        open_cache,
+        entropy_profile,
+        byte_histogram,
+        shannon_entropy,
+        top_ngrams,
+        open_store,
+        index_files,
+        load_constant_index,
+        iter_selected_constants,
+        INDEX_SUFFIX,
+        ExtractionLimits,
+        decompile_bin
     )
     print("✅ Import ฟังก์ชันจาก app.py สำเร็จ")
 except ImportError as e:
     print(f"❌ ไม่สามารถ import ฟังก์ชันได้: {e}")
     sys.exit(1)
 
+def _simple_bin():
+    """คืน path ของ examples/test_simple.bin (สร้างถ้ายังไม่มี) ไม่ขึ้นกับ working directory"""
+    path = os.path.join(EXAMPLES_DIR, 'test_simple.bin')
+    if not os.path.exists(path):
+        from create_sample import create_simple_bin
+        create_simple_bin(path)
+    return path
+
+def _write_bin(path, constants):
+    """เขียนไฟล์ .bin ที่มี constant ตามที่กำหนด"""
+    from create_sample import write_varint
+    with open(path, 'wb') as f:
+        f.write(b'\x8e\x06\xde\xc0')
+        f.write(write_varint(len(constants)))
+        for constant in constants:
+            f.write(write_varint(len(constant)))
+            f.write(constant)
+    return path
+
 def test_read_varint():
     """ทดสอบฟังก์ชัน read_varint"""
     print("\n🧪 ทดสอบ read_varint...")
@@ -64,6 +115,42 @@ def test_extract_strings():
     except Exception as e:
         print(f"  ❌ Error: {e}")
 
+def test_scan_strings():
+    """ทดสอบฟังก์ชัน scan_strings (ระบุ detector ของแต่ละ string)"""
+    print("\n🧪 ทดสอบ scan_strings...")
+    
+    test_data = b'hello\x00\xff\x05test!\xffaGVsbG8gd29ybGQ=\xff68656c6c6f\xff\xe0\xb8\x97\xe0\xb8\x94\xe0\xb8\xaa'
+    
+    try:
+        hits = list(scan_strings(test_data))
+        for hit in hits:
+            print(f"  ✅ [{hit.offset:3}] {hit.detector:16} {hit.text!r}")
+        
+        expected = {
+            ('null_terminated', 'hello'),
+            ('length_prefixed', 'test!'),
+            ('base64', 'hello world'),
+            ('hex', 'hello'),
+            ('utf8', 'ทดส'),
+        }
+        found = {(hit.detector, hit.text) for hit in hits}
+        missing = expected - found
+        if missing:
+            print(f"  ❌ ไม่พบ: {sorted(missing)}")
+        assert not missing
+        
+        # base64 ของ hex ของ "hello world" ถอดได้สองชั้นเมื่อเปิด nested decoding
+        nested = b'\xff' + base64.b64encode(b'68656c6c6f20776f726c64') + b'\xff'
+        hits = list(nested_payloads(scan_strings(nested), depth=2))
+        texts = [hit_string(hit) for hit in hits]
+        print(f"  ✅ nested: {texts}")
+        assert 'base64:hex:hello world' in texts
+        assert list(nested_payloads(scan_strings(nested), depth=2, budget=0)) == list(scan_strings(nested))
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
 def test_categorize_strings():
     """ทดสอบฟังก์ชัน categorize_strings"""
     print("\n🧪 ทดสอบ categorize_strings...")
@@ -143,19 +230,12 @@ def test_with_sample_file():
     """ทดสอบด้วยไฟล์ตัวอย่าง"""
     print("\n🧪 ทดสอบด้วยไฟล์ตัวอย่าง...")
     
-    # สร้างไฟล์ตัวอย่างก่อน
-    if not os.path.exists('test_simple.bin'):
-        print("  📁 ไม่พบไฟล์ test_simple.bin, กำลังสร้าง...")
-        try:
-            from create_sample import create_simple_bin
-            create_simple_bin()
-        except:
-            print("  ❌ ไม่สามารถสร้างไฟล์ตัวอย่างได้")
-            return
+    # สร้างไฟล์ตัวอย่างก่อน (ถ้ายังไม่มี)
+    sample = _simple_bin()
     
     # ทดสอบการอ่านไฟล์
     try:
-        with open('test_simple.bin', 'rb') as f:
+        with open(sample, 'rb') as f:
             data = f.read()
         
         print(f"  ✅ อ่านไฟล์ test_simple.bin สำเร็จ ({len(data)} bytes)")
@@ -169,6 +249,522 @@ def test_with_sample_file():
     except Exception as e:
         print(f"  ❌ Error: {e}")
 
+def test_iter_constants():
+    """ทดสอบ streaming API: iter_constants + decode/extract stages"""
+    print("\n🧪 ทดสอบ iter_constants...")
+    
+    sample = _simple_bin()
+    
+    try:
+        # อ่านเฉพาะตาราง entry โดยไม่ต้องแยก strings
+        entries = [(e.index, e.offset, e.length) for e in iter_constants(sample)]
+        print(f"  ✅ ตาราง entry: {entries}")
+        assert [length for _, _, length in entries] == [5, 5, 4, 10, 11]
+        
+        # index แบบ array: เข้าถึง entry ใดก็ได้โดยไม่ต้องเดินตารางใหม่
+        with map_bin_file(sample) as data:
+            count, offset = read_pool_header(data)
+            index = read_constant_index(data, count, offset)
+            assert list(zip(index.offsets, index.lengths)) == [(o, l) for _, o, l in entries]
+            assert bytes(constant_entry(data, index, 3).data) == b'createHash'
+        
+        # ต่อ stage แบบ lazy และหยุดก่อนครบได้
+        results = extract_constants(decode_constants(iter_constants(sample)))
+        first = next(results)
+        results.close()
+        print(f"  ✅ entry แรก: {first.strings}")
+        assert first.strings == ['hello']
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
+def test_output_records():
+    """ทดสอบ schema ของ record สำหรับ --format json/ndjson"""
+    print("\n🧪 ทดสอบ iter_output_records...")
+    
+    sample = _simple_bin()
+    
+    try:
+        records = list(iter_output_records(sample))
+        *constants, summary = records
+        print(f"  ✅ constant records: {len(constants)}")
+        assert [r['index'] for r in constants] == [0, 1, 2, 3, 4]
+        assert constants[3]['strings'][0]['text'] == 'createHash'
+        assert constants[3]['strings'][0]['category'] == 'api_calls'
+        
+        print(f"  ✅ summary: {summary}")
+        assert summary['type'] == 'summary' and summary['valid']
+        assert summary['string_count'] == 5
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
+def test_string_table():
+    """ทดสอบ StringTable: เก็บข้อความซ้ำครั้งเดียว แต่จำทุกจุดที่พบ"""
+    print("\n🧪 ทดสอบ StringTable...")
+    
+    sample = _simple_bin()
+    
+    try:
+        table = new_string_table()
+        for _ in collect_strings(extract_constants(decode_constants(iter_constants(sample))), table):
+            pass
+        table.add('hello', 9, 4, 'utf8')
+        print(f"  ✅ {len(table.strings)} ข้อความ, {len(table)} จุดที่พบ, {table.nbytes()} bytes")
+        assert table.strings[0] == 'hello' and len(table.strings) == 5 and len(table) == 6
+        assert table.occurrences(table.string_id('hello')) == [(0, 0, 'direct_utf8'), (9, 4, 'utf8')]
+        
+        categories, functionality = classify_table(table)
+        assert [table.strings[i] for i in categories['api_calls']] == ['createHash']
+        assert table.sorted_strings() == analyze_file(sample)['strings']
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
+def test_watchlist():
+    """ทดสอบ watchlist: จับคู่ indicator หลายรายการในรอบเดียว + cache บนดิสก์"""
+    print("\n🧪 ทดสอบ watchlist...")
+    import tempfile
+    from watchlist import Watchlist
+    
+    sample = _simple_bin()
+    
+    try:
+        folder = tempfile.mkdtemp()
+        lists = []
+        for name, text in [('apis', '# API names\ncreateHash\nHash\n'), ('words', 'hello\nell\nHash\n')]:
+            lists.append(os.path.join(folder, name + '.txt'))
+            with open(lists[-1], 'w') as f:
+                f.write(text)
+        cache = os.path.join(folder, 'lists.ac')
+        watchlist = Watchlist.load(lists, cache)
+        assert os.path.exists(cache) and len(watchlist) == 4
+        
+        hits = [hit for entry in iter_constants(sample) for hit in watchlist.scan_entry(entry)]
+        print(f"  ✅ พบ {len(hits)} จุด: {[(h.entry, h.offset, h.indicator) for h in hits]}")
+        assert [(h.entry, h.offset, h.indicator) for h in hits] == [
+            (0, 1, 'ell'), (0, 0, 'hello'), (3, 0, 'createHash'), (3, 6, 'Hash')]
+        assert hits[3].lists == ['apis', 'words']
+        
+        # โหลดซ้ำจาก cache ต้องได้ผลเหมือนเดิม
+        cached = Watchlist.load(lists, cache)
+        assert [cached.scan(bytes(entry.data)) for entry in iter_constants(sample)] == \
+               [watchlist.scan(bytes(entry.data)) for entry in iter_constants(sample)]
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
+def test_similarity():
+    """ทดสอบ fingerprint แบบ MinHash และ LSH index"""
+    print("\n🧪 ทดสอบ similarity index...")
+    import tempfile
+    from array import array
+    from similarity import SimilarityIndex, similarity
+    
+    sample = _simple_bin()
+    
+    try:
+        first, second = new_sketch(), new_sketch()
+        analyze_file(sample, sketch=first)
+        analyze_file(sample, sketch=second)
+        assert first.features == 5 and first.digest() == second.digest()
+        other = new_sketch()
+        other.add_strings(['hello', 'world', 'test', 'crypto'])
+        score = similarity(first.signature(), other.signature())
+        print(f"  ✅ ความคล้าย (ประมาณ Jaccard 3/6): {score:.2f}")
+        assert 0 < score < 1
+        
+        with SimilarityIndex(os.path.join(tempfile.mkdtemp(), 'similar.db')) as index:
+            index.add('a.bin', first.signature(), first.features)
+            index.add('b.bin', second.digest(), second.features)
+            index.add('empty.bin', new_sketch().signature(), 0)
+            assert index.query(first.signature(), exclude='./a.bin') == [(os.path.abspath('b.bin'), 1.0)]
+            assert index.clusters() == [[os.path.abspath('a.bin'), os.path.abspath('b.bin')]]
+            print(f"  ✅ index: {len(index)} ไฟล์, กลุ่ม {index.clusters()}")
+        
+        # สายโซ่ x ~ y ~ z อยู่ใน bucket เดียวกัน แม้ x กับ z จะไม่คล้ายกัน
+        x = array('Q', range(128))
+        y = x[:64] + array('Q', range(1064, 1128))
+        z = x[:4] + array('Q', range(2004, 2064)) + y[64:]
+        with SimilarityIndex(os.path.join(tempfile.mkdtemp(), 'similar.db')) as index:
+            for name, signature in (('x', x), ('y', y), ('z', z)):
+                index.add(name, signature, 0)
+            assert [len(group) for group in index.clusters(0.5)] == [3]
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
+def test_daemon():
+    """ทดสอบ daemon: worker pool ที่อุ่นไว้ + ส่งผลกลับแบบ streaming"""
+    print("\n🧪 ทดสอบ daemon...")
+    import asyncio
+    import tempfile
+    import threading
+    from daemon import AnalysisServer, submit
+    
+    sample = _simple_bin()
+    
+    socket_path = os.path.join(tempfile.mkdtemp(), 'nwbin.sock')
+    server = AnalysisServer(workers=1, queue_size=2)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(server.start(socket_path), loop).result(30)
+        results = {r['path']: r for r in submit([sample, 'missing.bin'], socket_path)}
+        print(f"  ✅ ผลลัพธ์ {len(results)} ไฟล์")
+        assert results[sample]['strings'] == analyze_file(sample)['strings']
+        assert not results['missing.bin']['valid']
+        
+        text = next(submit([sample], socket_path, fmt='text'))
+        assert 'createHash' in text['output']
+        try:
+            next(submit([], socket_path))
+            assert False, "ควรถูกปฏิเสธ"
+        except ValueError as e:
+            print(f"  ✅ ปฏิเสธคำขอที่ผิดรูปแบบ: {e}")
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+    finally:
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result(30)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+def test_diff():
+    """ทดสอบ --diff: string ที่ยังอยู่ใน constant ที่ไม่เปลี่ยนต้องไม่ถูกนับว่าหายไป"""
+    print("\n🧪 ทดสอบ diff_builds...")
+    import tempfile
+    
+    try:
+        folder = tempfile.mkdtemp()
+        old = _write_bin(os.path.join(folder, 'old.bin'),
+                         [b'createHash', b'\xff\xfecreateHash\x00\xffsecretToken\x00'])
+        new = _write_bin(os.path.join(folder, 'new.bin'), [b'createHash', b'\xff\xfeotherThing\x00'])
+        diff = diff_builds(old, new)
+        print(f"  ✅ เพิ่ม {diff['added_strings']}, หาย {diff['removed_strings']}")
+        assert diff['unchanged_constants'] == 1 and diff['changed_constants'] == [1]
+        assert diff['added_strings'] == {'other': ['otherThing']}
+        assert diff['removed_strings'] == {'other': ['secretToken']}
+        assert diff['functionality_added'] == [] and diff['functionality_removed'] == []
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
+def test_parallel_extraction():
+    """ทดสอบ -j: ผลจาก process pool ต้องเหมือนการทำงานแบบ process เดียวทุกประการ"""
+    print("\n🧪 ทดสอบ extract_constants แบบขนาน...")
+    import tempfile
+    
+    try:
+        folder = tempfile.mkdtemp()
+        # constant ใหญ่กว่า chunk_size หลายเท่า เพื่อให้ถูกตัดเป็นหลายชิ้น
+        big = b''.join(b'\xffkey%04d\x00\x05value\x00aGVsbG8gd29ybGQ=\xfe' % i for i in range(200))
+        path = _write_bin(os.path.join(folder, 'big.bin'), [b'hello', big, b'\x01\x02', b'createHash'])
+        
+        def extract(**options):
+            return [(r.entry.index, r.strings, r.hits)
+                    for r in extract_constants(decode_constants(iter_constants(path)), **options)]
+        
+        serial = extract()
+        parallel = extract(workers=2, chunk_size=256)
+        print(f"  ✅ serial {sum(len(s) for _, s, _ in serial)} strings, "
+              f"parallel {sum(len(s) for _, s, _ in parallel)} strings")
+        assert [index for index, _, _ in parallel] == [0, 1, 2, 3]
+        assert parallel == serial
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
+def test_analysis_cache():
+    """ทดสอบ --cache: hit ครั้งที่สอง, key แยกตาม namespace/min_length และการ evict แบบ LRU"""
+    print("\n🧪 ทดสอบ AnalysisCache...")
+    import tempfile
+    from analysis_cache import AnalysisCache
+    
+    try:
+        folder = tempfile.mkdtemp()
+        big = b'\xff'.join(b'createHash%04d' % i for i in range(40))
+        path = _write_bin(os.path.join(folder, 'cached.bin'), [b'hello', big])
+        
+        with open_cache(os.path.join(folder, 'cache.db')) as cache:
+            def extract():
+                return [r.strings for r in extract_constants(decode_constants(iter_constants(path)), cache=cache)]
+            
+            first = extract()
+            assert (cache.hits, cache.misses) == (0, 1)  # constant เล็กไม่ถูก cache
+            second = extract()
+            print(f"  ✅ hits={cache.hits}, misses={cache.misses}")
+            assert (cache.hits, cache.misses) == (1, 1) and second == first
+            assert cache.get(big, 4) is None  # min_length ต่างกัน
+            assert not cache.cacheable(b'hello') and cache.get(b'hello', 3) is None
+        
+        with AnalysisCache(os.path.join(folder, 'cache.db'), namespace='other') as other:
+            assert other.get(big, 3) is None  # analyzer version อื่น
+        
+        # 10 entry (~550 bytes หลังบีบอัด) เกินเพดาน 5 KB: entry เก่าสุดต้องถูกลบ ล่าสุดต้องอยู่
+        with AnalysisCache(os.path.join(folder, 'small.db'), max_bytes=5000, min_size=1) as small:
+            values = [os.urandom(512).hex() for _ in range(10)]
+            for i, value in enumerate(values):
+                small.put(b'key%d' % i, 3, value)
+            kept = [i for i in range(10) if small.get(b'key%d' % i, 3) == values[i]]
+            print(f"  ✅ entry ที่เหลือหลัง evict: {kept}")
+            assert kept and kept[0] > 0 and kept[-1] == 9
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
+def test_entropy_profile():
+    """ทดสอบ entropy_profile แบบ sliding window เทียบกับการนับใหม่ทุก window"""
+    print("\n🧪 ทดสอบ entropy_profile...")
+    import random
+    
+    try:
+        rng = random.Random(11)
+        data = bytes(rng.randrange(16) for _ in range(3000)) + bytes(rng.randrange(256) for _ in range(3000))
+        # stride หาร window ลงตัว (ใช้ histogram แบบเลื่อน) และหารไม่ลงตัว/ไม่ซ้อนกัน (นับทีละ window)
+        for window, stride in [(512, 64), (1000, 300), (256, 256), (300, 500)]:
+            profile = entropy_profile(data, window, stride)
+            naive = [(start, shannon_entropy(byte_histogram(data[start:start + window])))
+                     for start in range(0, len(data) - window + 1, stride)]
+            assert [offset for offset, _ in profile] == [start for start, _ in naive]
+            assert all(abs(a - b) < 1e-9 for (_, a), (_, b) in zip(profile, naive)), (window, stride)
+        print(f"  ✅ {len(profile)} window ตรงกับการนับตรงๆ, entropy สูงสุด {max(e for _, e in profile):.2f}")
+        
+        assert entropy_profile(b'abc', 4096) == [(0, shannon_entropy(byte_histogram(b'abc')))]
+        assert entropy_profile(b'', 4096) == []
+        try:
+            entropy_profile(data, 0)
+            assert False, "window 0 ต้องถูกปฏิเสธ"
+        except ValueError:
+            pass
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
+def test_top_ngrams():
+    """ทดสอบ top_ngrams: เมื่อ summary ล้น ค่าจริงต้องอยู่ระหว่าง count กับ count + error"""
+    print("\n🧪 ทดสอบ top_ngrams...")
+    import random
+    from collections import Counter
+    
+    try:
+        rng = random.Random(12)
+        data = b''.join(rng.choice([b'MZ\x90\x00', b'\xde\xad\xbe\xef', bytes(rng.randrange(256) for _ in range(4))])
+                        for _ in range(4000))
+        for n in (2, 3, 4):
+            exact = Counter(data[i:i + n] for i in range(len(data) - n + 1))
+            # summary ขนาดใหญ่พอ: นับตรงทุกตัว
+            full = top_ngrams(data, n, k=5, capacity=len(exact) + 1)
+            assert [(g.gram, g.count, g.error) for g in full] == \
+                [(gram, count, 0) for gram, count in sorted(exact.items(), key=lambda i: (-i[1], i[0]))[:5]]
+            # summary เล็กและ chunk เล็ก: เป็นการประมาณที่มีขอบเขต
+            approx = top_ngrams(data, n, k=3, capacity=16, chunk_size=1024)
+            assert approx[0].error > 0
+            for gram in approx:
+                assert gram.count <= exact[gram.gram] <= gram.count + gram.error, (n, gram)
+        print(f"  ✅ {approx[0].gram!r}: {approx[0].count} (+{approx[0].error})")
+        assert approx[0].gram in (b'MZ\x90\x00', b'\xde\xad\xbe\xef')
+        assert top_ngrams(b'ab', 4) == []
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
+def test_string_store():
+    """ทดสอบ --index-db: ค้นหาว่า string อยู่ในไฟล์ไหน, ตำแหน่งใด และ string ที่พบบ่อยที่สุด"""
+    print("\n🧪 ทดสอบ StringStore...")
+    import tempfile
+    
+    sample = _simple_bin()
+    
+    try:
+        folder = tempfile.mkdtemp()
+        other = _write_bin(os.path.join(folder, 'other.bin'), [b'\xff\xfecreateHash\x00', b'/etc/passwd'])
+        with open_store(os.path.join(folder, 'strings.db')) as store:
+            summaries = list(index_files([sample, other], store))
+            assert [s['valid'] for s in summaries] == [True, True]
+            # ทำ index ซ้ำต้องแทนที่ข้อมูลเดิม ไม่ใช่เพิ่มซ้ำ
+            store.add_records(other, iter_output_records(other))
+            
+            print(f"  ✅ createHash อยู่ใน {store.files_containing('createHash')}")
+            assert store.files_containing('createHash') == sorted([sample, other])
+            assert store.files_containing('/etc/passwd') == [other]
+            assert store.files_containing('missing') == []
+            
+            with map_bin_file(other) as data:
+                count, offset = read_pool_header(data)
+                index = read_constant_index(data, count, offset)
+                expected = index.offsets[0] + bytes(constant_entry(data, index, 0).data).index(b'createHash')
+            found = [o for o in store.occurrences('createHash') if o[0] == other]
+            print(f"  ✅ ตำแหน่งใน other.bin: {[(entry, offset, detector) for _, entry, offset, detector in found]}")
+            assert {(entry, offset) for _, entry, offset, _ in found} == {(0, expected)}
+            assert len(found) == len(set(found))  # ไม่มีแถวซ้ำจากการ index รอบสอง
+            assert 'null_terminated' in [detector for *_, detector in found]
+            
+            top = store.top_strings(limit=1)
+            assert top == [('createHash', 2)]
+            assert store.top_strings('file_paths') == [('/etc/passwd', 1)]
+            assert store.strings_in_file(other) == ['/etc/passwd', 'createHash']
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
+def test_profiler():
+    """ทดสอบ --profile: มีสถิติครบทุก stage/detector และไม่เปลี่ยนผลการวิเคราะห์"""
+    print("\n🧪 ทดสอบ Profiler...")
+    import json
+    import tempfile
+    from profiling import Profiler
+    
+    try:
+        folder = tempfile.mkdtemp()
+        constants = [b'hello', b'\xff\xfecreateHash\x00\xffaGVsbG8gd29ybGQ=\xff']
+        path = _write_bin(os.path.join(folder, 'profiled.bin'), constants)
+        
+        profiler = Profiler()
+        profiler.start()
+        report = analyze_file(path, profiler=profiler)
+        profiler.stop()
+        assert report == analyze_file(path)
+        
+        stages = {row['stage']: row for row in profiler.report()}
+        print(f"  ✅ stages: {list(stages)}")
+        for name in ('decode', 'extract', 'table', 'classify'):
+            assert name in stages, name
+        assert stages['extract']['items'] == 2
+        assert stages['extract']['bytes'] == sum(len(c) for c in constants)
+        assert stages['detector:base64']['items'] == 1  # aGVsbG8gd29ybGQ=
+        assert all(row['seconds'] >= 0 for row in stages.values())
+        
+        table = profiler.format_table()
+        assert 'detector:utf8' in table and 'total (wall)' in table
+        document = json.loads(profiler.to_json())
+        assert document['wall_seconds'] > 0 and document['stages'] == profiler.report()
+        
+        # รวมสถิติจาก worker process อื่น (analyze_batch -j)
+        merged = Profiler()
+        merged.merge(profiler.report())
+        merged.merge(profiler.report())
+        assert merged.stages['extract'].items == 4
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
+def test_index_sidecar():
+    """ทดสอบ sidecar .idx: เขียนเฉพาะเมื่อขอ, ใช้ซ้ำโดยไม่เดินตาราง และไม่ใช้เมื่อไฟล์เปลี่ยน"""
+    print("\n🧪 ทดสอบ load_constant_index...")
+    import tempfile
+    import app
+    
+    def load(path, write=False):
+        with map_bin_file(path) as data:
+            count, offset = read_pool_header(data)
+            index = load_constant_index(path, data, count, offset, write=write)
+            return list(zip(index.offsets, index.lengths))
+    
+    def walk_fails(*args):
+        raise AssertionError("ควรใช้ sidecar แทนการเดินตาราง")
+    
+    try:
+        folder = tempfile.mkdtemp()
+        path = _write_bin(os.path.join(folder, 'indexed.bin'), [b'hello', b'world!', b'createHash'])
+        sidecar = path + INDEX_SUFFIX
+        
+        expected = load(path)
+        assert not os.path.exists(sidecar)  # ไม่เขียนอะไรข้างไฟล์ input ถ้าไม่ได้ขอ
+        assert load(path, write=True) == expected and os.path.exists(sidecar)
+        
+        walk = app.read_constant_index
+        app.read_constant_index = walk_fails
+        try:
+            assert load(path) == expected
+            selected = [r.strings for r in iter_selected_constants(path, [2, 0])]
+        finally:
+            app.read_constant_index = walk
+        print(f"  ✅ ใช้ sidecar ซ้ำ: {expected}, entry [2, 0] = {selected}")
+        assert selected == [['createHash'], ['hello']]
+        
+        # ไฟล์ถูกเขียนใหม่ (ขนาดเท่าเดิม): sidecar เก่าต้องถูกมองว่า stale
+        _write_bin(path, [b'hello', b'createHash', b'world!'])
+        changed = load(path)
+        assert changed != expected and changed == [(e.offset, e.length) for e in iter_constants(path)]
+        assert load(path, write=True) == changed
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
+def test_extraction_limits():
+    """ทดสอบ ExtractionLimits: จำกัดจำนวน string, หมวดหมู่, ความยาว และช่วง entry/ขนาด"""
+    print("\n🧪 ทดสอบ ExtractionLimits...")
+    import contextlib
+    import io
+    import tempfile
+    from app import main as app_main
+    
+    def strings(path, **limits):
+        records = list(iter_output_records(path, limits=ExtractionLimits(**limits)))
+        # string เดียวกันอาจถูกพบโดยหลาย detector: เทียบเฉพาะข้อความที่ไม่ซ้ำ
+        return {r['index']: list(dict.fromkeys(hit['text'] for hit in r['strings'])) for r in records[:-1]}, records[-1]
+    
+    try:
+        folder = tempfile.mkdtemp()
+        many = b'\xff'.join([b'\xfecreateHash', b'alpha1', b'beta22', b'/usr/lib/node', b'gamma333'])
+        path = _write_bin(os.path.join(folder, 'limited.bin'), [b'hello', many, b'\xff\xfe', b'https://x.io'])
+        
+        found, summary = strings(path, max_per_entry=2)
+        print(f"  ✅ max_per_entry=2: {found}")
+        assert found[1] == ['createHash', 'alpha1'] and summary['string_count'] == 4
+        
+        found, summary = strings(path, max_total=3)
+        assert sorted(found) == [0, 1] and summary['string_count'] == 3  # หยุดก่อนถึง entry 3
+        
+        found, _ = strings(path, categories=frozenset({'file_paths', 'urls'}))
+        assert found == {0: [], 1: ['/usr/lib/node'], 2: [], 3: ['https://x.io']}
+        
+        found, _ = strings(path, max_length=6)
+        assert found[0] == ['hello'] and found[1] == ['alpha1', 'beta22'] and found[3] == []
+        
+        found, summary = strings(path, entry_range=(1, 3))
+        assert sorted(found) == [1, 2] and summary['constant_count'] == 4
+        found, _ = strings(path, size_range=(None, 5))
+        assert sorted(found) == [0, 2]
+        
+        # output แบบ text: ซ่อน constant ที่ไม่มี string เฉพาะเมื่อมีการกรอง string
+        for limits, shown in [(ExtractionLimits(entry_range=(1, None)), True),
+                              (ExtractionLimits(max_length=6), False)]:
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                decompile_bin(path, limits=limits)
+            assert ('[02] Length: 2' in out.getvalue()) == shown, limits
+        
+        # ช่วงที่ติดลบต้องถูกปฏิเสธตั้งแต่ตอนอ่าน argument
+        for option in ('--entry-range', '--size-range'):
+            try:
+                with contextlib.redirect_stderr(io.StringIO()):
+                    app_main([path, option, '-1:3'])
+                assert False, f"{option} -1:3 ต้องถูกปฏิเสธ"
+            except SystemExit as e:
+                assert e.code == 2
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        raise
+
 def main():
     """รันการทดสอบทั้งหมด"""
     print("🧪 เริ่มทดสอบ NWBinAnalyzer Functions")
@@ -176,10 +772,26 @@ def main():
     
     test_read_varint()
     test_extract_strings()
+    test_scan_strings()
     test_categorize_strings()
     test_analyze_functionality()
     test_find_relationships()
     test_with_sample_file()
+    test_iter_constants()
+    test_output_records()
+    test_string_table()
+    test_watchlist()
+    test_similarity()
+    test_daemon()
+    test_diff()
+    test_parallel_extraction()
+    test_analysis_cache()
+    test_entropy_profile()
+    test_top_ngrams()
+    test_string_store()
+    test_profiler()
+    test_index_sidecar()
+    test_extraction_limits()
     
     print("\n" + "=" * 50)
     print("✅ การทดสอบเสร็จสิ้น!")
@@ -0,0 +1,185 @@
+# profiling.py
+"""Per-stage timing, volume and memory accounting for the analyzer
+
+A Profiler is passed explicitly to the functions that support it (there is
+no global state); with profiler=None they skip every measurement, so the
+instrumentation costs nothing when it is off. Times are exclusive: a stage
+nested in another (a detector inside extraction, or an upstream generator
+pulled by a downstream one) is not counted twice.
+"""
+import cProfile
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_rss_kb():
+    """Return the process's peak resident set size in KiB (None if unknown)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # macOS reports bytes
+
+class StageStats:
+    """Accumulated wall time, bytes and items of one stage"""
+    __slots__ = ('name', 'seconds', 'bytes', 'items', 'calls', 'peak_rss_kb')
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.bytes = 0
+        self.items = 0
+        self.calls = 0
+        self.peak_rss_kb = None
+
+    def as_dict(self):
+        return {
+            'stage': self.name,
+            'seconds': round(self.seconds, 6),
+            'bytes': self.bytes,
+            'items': self.items,
+            'calls': self.calls,
+            'mb_per_s': round(self.bytes / self.seconds / 1e6, 3) if self.bytes and self.seconds else None,
+            'peak_rss_kb': self.peak_rss_kb,
+        }
+
+class Profiler:
+    """Collects StageStats for named stages
+
+    Use stage() around a block of work, or iterate() to account the time
+    spent producing the items of a lazy pipeline stage. With cprofile_path,
+    start() and stop() also run cProfile and dump pstats to that file.
+    """
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, cprofile_path=None):
+        self.stages = {}
+        self.cprofile_path = cprofile_path
+        self._cprofile = None
+        self._nested = []  # Time spent in child stages, per open stage
+        self._started = None
+        self.wall = 0.0
+
+    def _stats(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(name)
+        return stats
+
+    def _enter(self):
+        self._nested.append(0.0)
+        return time.perf_counter()
+
+    def _leave(self, stats, started):
+        elapsed = time.perf_counter() - started
+        stats.seconds += elapsed - self._nested.pop()
+        if self._nested:
+            self._nested[-1] += elapsed
+
+    @contextmanager
+    def stage(self, name, nbytes=0, items=0):
+        """Time a block as part of stage name; the yielded StageStats can take more items"""
+        stats = self._stats(name)
+        stats.calls += 1
+        stats.bytes += nbytes
+        stats.items += items
+        started = self._enter()
+        try:
+            yield stats
+        finally:
+            self._leave(stats, started)
+            stats.peak_rss_kb = peak_rss_kb()
+
+    def add(self, name, seconds, nbytes=0, items=0):
+        """Account work the caller timed itself (with clock) to stage name
+
+        The time counts as nested in the stage that is currently open.
+        """
+        stats = self._stats(name)
+        stats.calls += 1
+        stats.seconds += seconds
+        stats.bytes += nbytes
+        stats.items += items
+        if self._nested:
+            self._nested[-1] += seconds
+
+    def iterate(self, name, iterable, size=None):
+        """Yield from iterable, accounting the time to produce each item to stage name
+
+        size(item) gives the bytes an item stands for.
+        """
+        stats = self._stats(name)
+        stats.calls += 1
+        iterator = iter(iterable)
+        while True:
+            started = self._enter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                stats.peak_rss_kb = peak_rss_kb()
+                return
+            finally:
+                self._leave(stats, started)
+            stats.items += 1
+            if size is not None:
+                stats.bytes += size(item)
+            yield item
+
+    def start(self):
+        """Start the wall clock (and cProfile, if a dump path was given)"""
+        self._started = time.perf_counter()
+        if self.cprofile_path:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self):
+        """Stop the wall clock and write the cProfile dump"""
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_path)
+            self._cprofile = None
+        if self._started is not None:
+            self.wall += time.perf_counter() - self._started
+            self._started = None
+
+    def merge(self, stages):
+        """Add stage dicts from another process (as returned by report())"""
+        for other in stages:
+            stats = self._stats(other['stage'])
+            stats.seconds += other['seconds']
+            stats.bytes += other['bytes']
+            stats.items += other['items']
+            stats.calls += other['calls']
+            if other['peak_rss_kb'] is not None:
+                stats.peak_rss_kb = max(stats.peak_rss_kb or 0, other['peak_rss_kb'])
+
+    def report(self):
+        """Return the stage statistics as a list of dicts, in first-use order"""
+        return [stats.as_dict() for stats in self.stages.values()]
+
+    def format_table(self):
+        """Return the statistics as a printable table"""
+        lines = [f"{'stage':26} {'seconds':>10} {'%':>6} {'MB/s':>10} {'items':>10} {'peak RSS KB':>12}"]
+        total = self.wall or sum(stats.seconds for stats in self.stages.values())
+        for row in self.report():
+            share = f"{100 * row['seconds'] / total:.1f}" if total else '-'
+            mb_per_s = f"{row['mb_per_s']:.2f}" if row['mb_per_s'] is not None else '-'
+            lines.append(f"{row['stage']:26} {row['seconds']:10.4f} {share:>6} {mb_per_s:>10} "
+                         f"{row['items']:>10} {row['peak_rss_kb'] or '-':>12}")
+        if self.wall:
+            untracked = self.wall - sum(stats.seconds for stats in self.stages.values())
+            if untracked > 0:
+                lines.append(f"{'(output, untracked)':26} {untracked:10.4f} {100 * untracked / self.wall:6.1f}")
+            lines.append(f"{'total (wall)':26} {self.wall:10.4f}")
+        return '\n'.join(lines)
+
+    def to_json(self):
+        """Return the statistics as one JSON document"""
+        return json.dumps({'wall_seconds': round(self.wall, 6), 'peak_rss_kb': peak_rss_kb(),
+                           'stages': self.report()})
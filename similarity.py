@@ -0,0 +1,333 @@
+# similarity.py
+"""MinHash fingerprints of .bin files and an on-disk LSH index over them
+
+A file's features are its distinct extracted strings plus the content
+hashes of its constants (constants shorter than MIN_CONSTANT_SIZE are left
+out: they are the same in every build). MinHash is the one-permutation
+variant: each feature is hashed once into one of NUM_BUCKETS buckets and
+only the smallest value per bucket is kept, so fingerprinting costs one
+BLAKE2b call per feature and can run alongside the analysis. Empty buckets
+are filled from other buckets (densification). The share of equal buckets
+in two signatures estimates the Jaccard similarity of the feature sets.
+
+The index is a single SQLite file. Each signature is cut into bands and
+every band is stored as a hashed key; files sharing a key in any band are
+candidates, and only those are compared, so finding similar builds does
+not compare against the whole corpus.
+
+Query from the command line:
+    python similarity.py similar.db --like app.bin
+    python similarity.py similar.db --clusters --threshold 0.8
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from array import array
+from itertools import islice
+
+NUM_BUCKETS = 128
+NUM_BANDS = 32
+MIN_CONSTANT_SIZE = 16
+DEFAULT_THRESHOLD = 0.5
+_MASK = (1 << 64) - 1
+_EMPTY = _MASK
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    features INTEGER NOT NULL,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    key INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    PRIMARY KEY (band, key, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bands_file ON bands (file_id);
+'''
+
+def _mix(x):
+    """splitmix64 finalizer: a fixed, well-spread 64-bit permutation"""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    return x ^ (x >> 31)
+
+class MinHash:
+    """One-permutation MinHash sketch, updated one feature at a time
+
+    features counts the updates, not the distinct features: a constant
+    that occurs several times in a file is counted each time (strings come
+    in already deduplicated). Repeats leave the signature unchanged.
+    """
+
+    def __init__(self, buckets=NUM_BUCKETS):
+        self.buckets = buckets
+        self.mins = array('Q', [_EMPTY]) * buckets
+        self.features = 0
+
+    def update(self, hashes):
+        """Add features given as 64-bit hashes"""
+        mins = self.mins
+        buckets = self.buckets
+        added = 0
+        for h in hashes:
+            bucket = h % buckets
+            value = h // buckets
+            if value < mins[bucket]:
+                mins[bucket] = value
+            added += 1
+        self.features += added
+
+    def add_strings(self, strings):
+        """Add extracted strings as features"""
+        self.update(int.from_bytes(hashlib.blake2b(s.encode('utf-8', 'surrogatepass'), digest_size=8,
+                                                   person=b'string').digest(), 'little')
+                    for s in strings)
+
+    def add_constant(self, data):
+        """Add the content of a constant as a feature (if it is long enough)"""
+        if len(data) >= MIN_CONSTANT_SIZE:
+            h = int.from_bytes(hashlib.blake2b(data, digest_size=8, person=b'constant').digest(), 'little')
+            bucket = h % self.buckets
+            value = h // self.buckets
+            if value < self.mins[bucket]:
+                self.mins[bucket] = value
+            self.features += 1
+
+    def signature(self):
+        """Return the densified signature as an array of NUM_BUCKETS values
+
+        An empty bucket takes the value of the first non-empty bucket on a
+        fixed pseudo-random probe sequence, so equal sets still give equal
+        signatures. With no features at all, every value stays empty.
+        """
+        mins = self.mins
+        signature = array('Q', mins)
+        if _EMPTY in mins and any(value != _EMPTY for value in mins):
+            for bucket, value in enumerate(mins):
+                attempt = 0
+                while value == _EMPTY:
+                    attempt += 1
+                    value = mins[_mix(bucket << 32 | attempt) % self.buckets]
+                signature[bucket] = value
+        return signature
+
+    def digest(self):
+        """Return the signature as little-endian bytes (see signature_from_bytes)"""
+        return _to_bytes(self.signature())
+
+def _normpath(path):
+    """Return the form a path is stored under in the index"""
+    return os.path.abspath(path)
+
+def _to_bytes(signature):
+    if sys.byteorder == 'big':
+        signature = array('Q', signature)
+        signature.byteswap()
+    return signature.tobytes()
+
+def signature_from_bytes(data):
+    """Return the signature array stored in data (as returned by MinHash.digest)"""
+    signature = array('Q')
+    signature.frombytes(data)
+    if sys.byteorder == 'big':
+        signature.byteswap()
+    return signature
+
+def similarity(a, b):
+    """Estimate the Jaccard similarity of two signatures (0.0 when either is empty)"""
+    if not a or a[0] == _EMPTY or b[0] == _EMPTY:
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+def band_keys(signature, bands):
+    """Return the LSH key of each band of signature, as signed 64-bit integers"""
+    rows = len(signature) // bands
+    data = _to_bytes(signature)
+    return [int.from_bytes(hashlib.blake2b(data[band * rows * 8:(band + 1) * rows * 8],
+                                           digest_size=8).digest(), 'little', signed=True)
+            for band in range(bands)]
+
+class SimilarityIndex:
+    """SQLite LSH index of file signatures
+
+    The number of buckets and bands is fixed when the index is created;
+    adding a file again replaces its previous signature. Files without
+    any feature are stored but never match.
+    """
+
+    def __init__(self, path, buckets=NUM_BUCKETS, bands=NUM_BANDS):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        with self._conn:
+            self._conn.executemany('INSERT OR IGNORE INTO meta (name, value) VALUES (?, ?)',
+                                   [('buckets', buckets), ('bands', bands)])
+        meta = dict(self._conn.execute('SELECT name, value FROM meta'))
+        self.buckets = meta['buckets']
+        self.bands = meta['bands']
+        if self.buckets % self.bands:
+            raise ValueError(f"{self.buckets} buckets do not split into {self.bands} bands")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def _check(self, signature):
+        if len(signature) != self.buckets:
+            raise ValueError(f"signature has {len(signature)} buckets, the index uses {self.buckets}")
+
+    def add(self, filepath, signature, features):
+        """Index the signature (array or bytes) of filepath"""
+        if isinstance(signature, bytes):
+            signature = signature_from_bytes(signature)
+        self._check(signature)
+        filepath = _normpath(filepath)
+        with self._conn:
+            row = self._conn.execute('SELECT id FROM files WHERE path = ?', (filepath,)).fetchone()
+            if row is not None:
+                self._conn.execute('DELETE FROM bands WHERE file_id = ?', row)
+                self._conn.execute('DELETE FROM files WHERE id = ?', row)
+            file_id = self._conn.execute(
+                'INSERT INTO files (path, features, signature) VALUES (?, ?, ?)',
+                (filepath, features, _to_bytes(signature))).lastrowid
+            if signature[0] != _EMPTY:
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO bands (band, key, file_id) VALUES (?, ?, ?)',
+                    [(band, key, file_id) for band, key in enumerate(band_keys(signature, self.bands))])
+
+    def signature(self, filepath):
+        """Return the stored signature of filepath, or None if it is not indexed"""
+        row = self._conn.execute('SELECT signature FROM files WHERE path = ?', (_normpath(filepath),)).fetchone()
+        return None if row is None else signature_from_bytes(row[0])
+
+    def _signatures(self, file_ids):
+        """Yield (file id, path, signature) for file_ids"""
+        file_ids = list(file_ids)
+        for start in range(0, len(file_ids), 500):
+            chunk = file_ids[start:start + 500]
+            rows = self._conn.execute(
+                'SELECT id, path, signature FROM files WHERE id IN (%s)' % ','.join('?' * len(chunk)), chunk)
+            for file_id, path, data in rows:
+                yield file_id, path, signature_from_bytes(data)
+
+    def query(self, signature, threshold=DEFAULT_THRESHOLD, limit=20, exclude=None):
+        """Return [(path, similarity)] of indexed files similar to signature, most similar first
+
+        Only files that share a band key with signature are compared, so a
+        pair is found with high probability once it is well above threshold.
+        Paths are stored absolute; exclude may be given in any form.
+        """
+        self._check(signature)
+        if signature[0] == _EMPTY:
+            return []
+        if exclude is not None:
+            exclude = _normpath(exclude)
+        candidates = set()
+        for band, key in enumerate(band_keys(signature, self.bands)):
+            candidates.update(file_id for file_id, in self._conn.execute(
+                'SELECT file_id FROM bands WHERE band = ? AND key = ?', (band, key)))
+        matches = []
+        for _, path, other in self._signatures(candidates):
+            score = similarity(signature, other)
+            if score >= threshold and path != exclude:
+                matches.append((path, score))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches[:limit]
+
+    def clusters(self, threshold=DEFAULT_THRESHOLD):
+        """Return groups of similar files (single linkage), largest first
+
+        Within each LSH bucket, every pair of members not yet in the same
+        group is compared, and joined when their signatures are at least
+        threshold similar.
+        """
+        parent = {}  # Union-find links, for every file joined to a smaller id
+
+        def root(file_id):
+            while file_id in parent:
+                file_id = parent[file_id]
+            return file_id
+
+        signatures = {}
+        paths = {}
+        buckets = self._conn.execute(
+            'SELECT band, key, GROUP_CONCAT(file_id) FROM bands GROUP BY band, key HAVING COUNT(*) > 1')
+        for _, _, members in buckets:
+            members = [int(file_id) for file_id in members.split(',')]
+            missing = [file_id for file_id in members if file_id not in signatures]
+            for file_id, path, signature in self._signatures(missing):
+                signatures[file_id] = signature
+                paths[file_id] = path
+            for i, file_id in enumerate(members):
+                for other in islice(members, i):
+                    a, b = root(file_id), root(other)
+                    if a != b and similarity(signatures[file_id], signatures[other]) >= threshold:
+                        parent[max(a, b)] = min(a, b)
+        groups = {}
+        for file_id in paths:
+            groups.setdefault(root(file_id), []).append(paths[file_id])
+        return sorted((sorted(group) for group in groups.values() if len(group) > 1),
+                      key=lambda group: (-len(group), group[0]))
+
+    def close(self):
+        """Commit and close the database"""
+        if self._conn is not None:
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Query a similarity index built with 'app.py --similarity-index'.")
+    parser.add_argument('index', help="SQLite similarity index file")
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument('--like', metavar='PATH',
+                       help="files similar to PATH (analysed first if it is not indexed)")
+    query.add_argument('--clusters', action='store_true', help="groups of similar files")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="minimum estimated Jaccard similarity (default: 0.5)")
+    parser.add_argument('--limit', type=int, default=20, help="rows for --like (default: 20)")
+    parser.add_argument('--min-length', type=int, default=3,
+                        help="minimum string length when PATH has to be analysed (default: 3)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.index):
+        parser.error(f"index not found: {args.index}")
+    with SimilarityIndex(args.index) as index:
+        if args.clusters:
+            rows = index.clusters(args.threshold)
+        else:
+            signature = index.signature(args.like)
+            if signature is None:
+                import app
+                sketch = MinHash(index.buckets)
+                report = app.analyze_file(args.like, args.min_length, sketch=sketch)
+                if not report['valid']:
+                    print(f"{args.like}: {report['error']}", file=sys.stderr)
+                    return 1
+                signature = sketch.signature()
+            rows = index.query(signature, args.threshold, args.limit, exclude=args.like)
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
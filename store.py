@@ -0,0 +1,204 @@
+# store.py
+"""Corpus-wide index of extracted strings
+
+Every distinct string is stored once in a dictionary table (with its
+category); each place it occurs is a row of integer ids: file, constant
+pool entry, file offset and detector. Indexes on string text, category and
+string id answer "which builds contain X" or "top URLs across all apps"
+without re-parsing any .bin file. The store is a single SQLite file filled
+from the records of app.iter_output_records.
+
+Query from the command line:
+    python store.py corpus.db --contains createHash
+    python store.py corpus.db --top urls
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER,
+    mtime REAL,
+    valid INTEGER NOT NULL,
+    error TEXT,
+    constant_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS strings (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE,
+    category TEXT
+);
+CREATE INDEX IF NOT EXISTS strings_category ON strings (category);
+CREATE TABLE IF NOT EXISTS detectors (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS occurrences (
+    string_id INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    entry_index INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    detector_id INTEGER NOT NULL,
+    PRIMARY KEY (string_id, file_id, offset, detector_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS occurrences_file ON occurrences (file_id);
+'''
+
+class StringStore:
+    """SQLite store of the strings found in a corpus of .bin files
+
+    Adding a file again replaces its previous rows. The category of a
+    string is categorize(text) of the stored text (app.open_store passes
+    app.categorize_string), not the category of the record, which was
+    computed on the prefixed display form (e.g. 'base64:...'); so a text
+    has one category whichever detector found it. Without categorize no
+    category is stored.
+    """
+
+    def __init__(self, path, categorize=None):
+        self.path = path
+        self._categorize = categorize
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._string_ids = {}
+        self._detector_ids = {name: detector_id for detector_id, name
+                              in self._conn.execute('SELECT id, name FROM detectors')}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _string_id(self, text):
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            row = self._conn.execute('SELECT id FROM strings WHERE text = ?', (text,)).fetchone()
+            if row is None:
+                category = self._categorize(text) if self._categorize is not None else None
+                string_id = self._conn.execute(
+                    'INSERT INTO strings (text, category) VALUES (?, ?)', (text, category)).lastrowid
+            else:
+                string_id = row[0]
+            self._string_ids[text] = string_id
+        return string_id
+
+    def _detector_id(self, name):
+        detector_id = self._detector_ids.get(name)
+        if detector_id is None:
+            detector_id = self._conn.execute(
+                'INSERT INTO detectors (name) VALUES (?)', (name,)).lastrowid
+            self._detector_ids[name] = detector_id
+        return detector_id
+
+    def add_records(self, filepath, records):
+        """Index the output records of one file and return its summary record
+
+        records is the stream of app.iter_output_records (constant records
+        followed by a summary). Offsets are stored relative to the file.
+        """
+        try:
+            stat = os.stat(filepath)
+            size, mtime = stat.st_size, stat.st_mtime
+        except OSError:
+            size = mtime = None
+        with self._conn:
+            row = self._conn.execute('SELECT id FROM files WHERE path = ?', (filepath,)).fetchone()
+            if row is not None:
+                self._conn.execute('DELETE FROM occurrences WHERE file_id = ?', row)
+                self._conn.execute('DELETE FROM files WHERE id = ?', row)
+            file_id = self._conn.execute(
+                'INSERT INTO files (path, size, mtime, valid, constant_count) VALUES (?, ?, ?, 0, 0)',
+                (filepath, size, mtime)).lastrowid
+
+            summary = None
+            for record in records:
+                if record['type'] == 'summary':
+                    summary = record
+                    continue
+                rows = [(self._string_id(hit['text']), file_id, record['index'],
+                         record['offset'] + hit['offset'], self._detector_id(hit['detector']))
+                        for hit in record['strings']]
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO occurrences (string_id, file_id, entry_index, offset, detector_id) '
+                    'VALUES (?, ?, ?, ?, ?)', rows)
+            if summary is not None:
+                self._conn.execute(
+                    'UPDATE files SET valid = ?, error = ?, constant_count = ? WHERE id = ?',
+                    (int(summary['valid']), summary['error'], summary['constant_count'], file_id))
+        return summary
+
+    def files_containing(self, text):
+        """Return the paths of the files in which text was found"""
+        return [path for path, in self._conn.execute(
+            'SELECT DISTINCT f.path FROM strings s '
+            'JOIN occurrences o ON o.string_id = s.id JOIN files f ON f.id = o.file_id '
+            'WHERE s.text = ? ORDER BY f.path', (text,))]
+
+    def occurrences(self, text):
+        """Return (path, entry_index, offset, detector) for every place text was found"""
+        return self._conn.execute(
+            'SELECT f.path, o.entry_index, o.offset, d.name FROM strings s '
+            'JOIN occurrences o ON o.string_id = s.id JOIN files f ON f.id = o.file_id '
+            'JOIN detectors d ON d.id = o.detector_id '
+            'WHERE s.text = ? ORDER BY f.path, o.offset', (text,)).fetchall()
+
+    def top_strings(self, category=None, limit=20):
+        """Return [(text, file_count)] for the strings found in the most files"""
+        where, args = ('WHERE s.category = ?', (category,)) if category else ('', ())
+        return self._conn.execute(
+            'SELECT s.text, COUNT(DISTINCT o.file_id) AS files FROM strings s '
+            'JOIN occurrences o ON o.string_id = s.id ' + where + ' '
+            'GROUP BY s.id ORDER BY files DESC, s.text LIMIT ?', args + (limit,)).fetchall()
+
+    def strings_in_file(self, filepath):
+        """Return the distinct strings indexed for one file, sorted"""
+        return [text for text, in self._conn.execute(
+            'SELECT DISTINCT s.text FROM files f '
+            'JOIN occurrences o ON o.file_id = f.id JOIN strings s ON s.id = o.string_id '
+            'WHERE f.path = ? ORDER BY s.text', (filepath,))]
+
+    def close(self):
+        """Commit and close the database"""
+        if self._conn is not None:
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Query a string store built with 'app.py --store'.")
+    parser.add_argument('store', help="SQLite store file")
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument('--contains', metavar='TEXT', help="files in which TEXT was found")
+    query.add_argument('--where', metavar='TEXT', help="every occurrence of TEXT")
+    query.add_argument('--top', metavar='CATEGORY', nargs='?', const='',
+                       help="strings found in the most files, optionally of one category")
+    query.add_argument('--file', metavar='PATH', help="strings indexed for one file")
+    parser.add_argument('--limit', type=int, default=20, help="rows for --top (default: 20)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.store):
+        parser.error(f"store not found: {args.store}")
+    with StringStore(args.store) as store:
+        if args.contains is not None:
+            rows = store.files_containing(args.contains)
+        elif args.where is not None:
+            rows = store.occurrences(args.where)
+        elif args.top is not None:
+            rows = store.top_strings(args.top or None, args.limit)
+        else:
+            rows = store.strings_in_file(args.file)
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
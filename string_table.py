@@ -0,0 +1,132 @@
+# string_table.py
+"""Compact table of extracted strings that keeps where each hit came from
+
+Every distinct string is stored once in a pool and referred to by an
+integer id. Each hit is one row of array-backed columns (string id,
+constant pool entry, offset inside the entry, detector code), so a hit
+costs 17 bytes instead of a str object of its own, and the entry and
+offset of every hit stay available. Category codes are another array,
+indexed by string id; deduplication, grouping and sorting work on ids and
+never copy the text.
+"""
+from array import array
+from itertools import repeat
+
+class StringTable:
+    """Interned string pool plus per-hit provenance columns
+
+    strings[id] is the text of string id. Row i of string_ids, entries,
+    offsets and detector_codes describes hit i; detectors[code] names a
+    detector code.
+    """
+
+    def __init__(self):
+        self.strings = []
+        self._ids = {}
+        self.string_ids = array('I')
+        self.entries = array('I')
+        self.offsets = array('Q')
+        self.detector_codes = array('B')
+        self.detectors = []
+        self._detector_codes = {}
+        self.categories = array('b')  # Per string id; -1 for none
+        self.flags = 0  # OR of the flag bits returned by the categorize() function
+        self._categorized = 0
+
+    def __len__(self):
+        """Number of hits"""
+        return len(self.string_ids)
+
+    def intern(self, text):
+        """Return the id of text, adding it to the pool if new"""
+        string_id = self._ids.get(text)
+        if string_id is None:
+            string_id = self._ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def _detector_code(self, detector):
+        code = self._detector_codes.get(detector)
+        if code is None:
+            code = self._detector_codes[detector] = len(self.detectors)
+            self.detectors.append(detector)
+        return code
+
+    def add(self, text, entry, offset, detector):
+        """Record one hit of text and return its string id"""
+        string_id = self.intern(text)
+        self.string_ids.append(string_id)
+        self.entries.append(entry)
+        self.offsets.append(offset)
+        self.detector_codes.append(self._detector_code(detector))
+        return string_id
+
+    def extend(self, entry, hits):
+        """Record the (text, offset, detector) hits of one constant pool entry"""
+        ids = self._ids
+        strings = self.strings
+        codes = self._detector_codes
+        string_ids = self.string_ids
+        offsets = self.offsets
+        detector_codes = self.detector_codes
+        added = len(string_ids)
+        for text, offset, detector in hits:
+            string_id = ids.get(text)
+            if string_id is None:
+                string_id = ids[text] = len(strings)
+                strings.append(text)
+            code = codes.get(detector)
+            if code is None:
+                code = self._detector_code(detector)
+            string_ids.append(string_id)
+            offsets.append(offset)
+            detector_codes.append(code)
+        self.entries.extend(repeat(entry, len(string_ids) - added))
+
+    def string_id(self, text):
+        """Return the id of text, or None if it was never added"""
+        return self._ids.get(text)
+
+    def hit(self, row):
+        """Return (text, entry, offset, detector) of hit row"""
+        return (self.strings[self.string_ids[row]], self.entries[row], self.offsets[row],
+                self.detectors[self.detector_codes[row]])
+
+    def occurrences(self, string_id):
+        """Return (entry, offset, detector) for every hit of string_id, in hit order"""
+        return [(self.entries[row], self.offsets[row], self.detectors[self.detector_codes[row]])
+                for row, other in enumerate(self.string_ids) if other == string_id]
+
+    def sorted_strings(self, ids=None):
+        """Return the text of ids (default: every string), sorted"""
+        if ids is None:
+            return sorted(self.strings)
+        strings = self.strings
+        return sorted([strings[string_id] for string_id in ids])
+
+    def categorize(self, classify):
+        """Fill in the category code of every string not categorized yet
+
+        classify(text) returns (category code, flag bits); codes must fit
+        in a signed byte. The flags of all strings are OR-ed into flags.
+        """
+        for text in self.strings[self._categorized:]:
+            code, bits = classify(text)
+            self.categories.append(code)
+            self.flags |= bits
+        self._categorized = len(self.strings)
+
+    def ids_by_category(self):
+        """Return {category code: array of string ids}, ids in pool order"""
+        groups = {}
+        for string_id, code in enumerate(self.categories):
+            ids = groups.get(code)
+            if ids is None:
+                ids = groups[code] = array('I')
+            ids.append(string_id)
+        return groups
+
+    def nbytes(self):
+        """Bytes held by the column arrays (the string pool not included)"""
+        return sum(column.itemsize * len(column) for column in
+                   (self.string_ids, self.entries, self.offsets, self.detector_codes, self.categories))
@@ -0,0 +1,229 @@
+# watchlist.py
+"""Byte-level matching of large indicator watchlists (IOCs)
+
+Indicator lists (URLs, domains, API names, known-bad strings) are compiled
+once into an Aho-Corasick automaton over bytes. Scanning a constant reads
+each of its bytes once and follows at most one failure link per byte on
+average, so throughput does not depend on how many indicators are watched.
+Bytes that occur in no indicator reset the automaton, so only runs of
+indicator bytes at least as long as the shortest indicator are walked; a
+regex finds those runs at C speed, which skips most of a binary constant.
+Compiling 100k indicators takes seconds, so the automaton is cached on disk
+(marshal, not pickle: loading it never runs code) and keyed by a hash of
+the lists; a stale or unreadable cache is simply rebuilt.
+
+A watchlist file has one indicator per line (UTF-8); blank lines and lines
+starting with '#' are ignored. The list is named after the file, without
+its extension. Matching is exact and case-sensitive.
+"""
+import hashlib
+import marshal
+import os
+import re
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
+WatchHit = namedtuple('WatchHit', ['entry', 'offset', 'indicator', 'lists'])
+
+# Cache file: magic, format version, key digest, then one marshalled tuple
+_CACHE_HEADER = struct.Struct('<4sH32s')
+_CACHE_MAGIC = b'NWAC'
+_CACHE_VERSION = 1
+
+def read_watchlist(path):
+    """Return (list name, [indicator bytes]) for a watchlist file"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    with open(path, 'rb') as f:
+        lines = (line.strip() for line in f)
+        return name, [line for line in lines if line and not line.startswith(b'#')]
+
+class Watchlist:
+    """Aho-Corasick automaton over the indicators of one or more lists
+
+    State 0 is the root. A transition from state s on byte b is
+    goto[s << 8 | b] (the root has an entry for every byte, so a failed
+    lookup always ends there); fail[s] is the failure link of s, and out[s]
+    the ids of every indicator that ends in s, its own and through suffixes.
+    """
+
+    def __init__(self, names, patterns, pattern_lists, goto, fail, out):
+        self.names = names
+        self.patterns = patterns
+        self.pattern_lists = pattern_lists
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self._lengths = [len(pattern) for pattern in patterns]
+        alphabet = b''.join(re.escape(bytes((byte,))) for byte in sorted(set(b''.join(patterns))))
+        shortest = min(self._lengths, default=1)
+        self._runs = re.compile(b'[%s]{%d,}' % (alphabet, shortest)) if patterns else None
+
+    @classmethod
+    def compile(cls, lists):
+        """Build the automaton from [(list name, [indicator bytes])]"""
+        names = []
+        ids = {}
+        patterns = []
+        pattern_lists = []
+        for name, indicators in lists:
+            list_id = len(names)
+            names.append(name)
+            for indicator in indicators:
+                pattern = ids.get(indicator)
+                if pattern is None:
+                    pattern = ids[indicator] = len(patterns)
+                    patterns.append(indicator)
+                    pattern_lists.append([])
+                if list_id not in pattern_lists[pattern]:
+                    pattern_lists[pattern].append(list_id)
+
+        # Trie: each state but the root has one parent edge
+        goto = {}
+        parents = array('I', [0])
+        edges = bytearray(1)
+        depths = [0]
+        ends = {}
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for byte in pattern:
+                key = state << 8 | byte
+                child = goto.get(key)
+                if child is None:
+                    child = goto[key] = len(parents)
+                    parents.append(state)
+                    edges.append(byte)
+                    depths.append(depths[state] + 1)
+                state = child
+            ends[state] = (pattern_id,)
+
+        # Failure links and outputs, parents before children
+        fail = array('I', bytes(4 * len(parents)))
+        out = {}
+        for state in sorted(range(1, len(parents)), key=depths.__getitem__):
+            parent = parents[state]
+            if parent:
+                byte = edges[state]
+                link = fail[parent]
+                while link and (link << 8 | byte) not in goto:
+                    link = fail[link]
+                link = goto.get(link << 8 | byte, 0)
+                fail[state] = link
+            else:
+                link = 0
+            found = ends.get(state, ()) + out.get(link, ())
+            if found:
+                out[state] = found
+        for byte in range(256):
+            goto.setdefault(byte, 0)
+        return cls(names, patterns, [tuple(lists) for lists in pattern_lists], goto, fail, out)
+
+    @classmethod
+    def load(cls, paths, cache_path=None):
+        """Read the watchlist files at paths, reusing the compiled cache_path if current
+
+        A missing or stale cache is rebuilt and saved; failures to write it
+        (e.g. read-only dirs) are ignored.
+        """
+        lists = [read_watchlist(path) for path in paths]
+        key = _cache_key(lists)
+        watchlist = _read_cache(cache_path, key) if cache_path else None
+        if watchlist is None:
+            watchlist = cls.compile(lists)
+            if cache_path:
+                watchlist._save(cache_path, key)
+        return watchlist
+
+    def __len__(self):
+        """Number of distinct indicators"""
+        return len(self.patterns)
+
+    @property
+    def states(self):
+        """Number of automaton states"""
+        return len(self._fail)
+
+    def scan(self, data):
+        """Return (offset, indicator id) for every indicator occurrence in data
+
+        Occurrences come out in the order they end; overlapping and nested
+        indicators are all reported.
+        """
+        get = self._goto.get
+        fail = self._fail
+        out = self._out
+        lengths = self._lengths
+        found = []
+        if self._runs is None:
+            return found
+        view = memoryview(data)
+        for run in self._runs.finditer(view):
+            start, stop = run.span()
+            state = 0
+            for end, byte in enumerate(view[start:stop], start + 1):
+                following = get(state << 8 | byte)
+                while following is None:
+                    state = fail[state]
+                    following = get(state << 8 | byte)
+                state = following
+                if state in out:
+                    for pattern in out[state]:
+                        found.append((end - lengths[pattern], pattern))
+        return found
+
+    def scan_entry(self, entry):
+        """Return a WatchHit for every indicator found in a constant pool entry"""
+        return [WatchHit(entry.index, offset, self.indicator(pattern), self.lists(pattern))
+                for offset, pattern in self.scan(entry.data)]
+
+    def indicator(self, pattern):
+        """Return the text of indicator id pattern"""
+        return self.patterns[pattern].decode('utf-8', 'replace')
+
+    def lists(self, pattern):
+        """Return the names of the lists indicator id pattern is on"""
+        return [self.names[list_id] for list_id in self.pattern_lists[pattern]]
+
+    def _save(self, path, key):
+        """Write the compiled automaton to path atomically"""
+        goto = self._goto
+        saved = (self.names, self.patterns, self.pattern_lists,
+                 array('Q', goto).tobytes(), array('I', goto.values()).tobytes(),
+                 self._fail.tobytes(), self._out)
+        temp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp, 'wb') as f:
+                f.write(_CACHE_HEADER.pack(_CACHE_MAGIC, _CACHE_VERSION, key))
+                marshal.dump(saved, f)
+            os.replace(temp, path)
+        except OSError:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+
+def _cache_key(lists):
+    """Return the digest a compiled cache of lists is stored under"""
+    digest = hashlib.blake2b(digest_size=32)
+    digest.update(sys.byteorder.encode())  # The arrays are saved in native byte order
+    for name, indicators in lists:
+        digest.update(b'%d:%s\n' % (len(indicators), name.encode('utf-8', 'surrogateescape')))
+        for indicator in indicators:
+            digest.update(b'%d:%s' % (len(indicator), indicator))
+    return digest.digest()
+
+def _read_cache(path, key):
+    """Return the Watchlist cached at path, or None if missing or stale"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(_CACHE_HEADER.size)
+            if len(header) != _CACHE_HEADER.size or _CACHE_HEADER.unpack(header) != (_CACHE_MAGIC, _CACHE_VERSION, key):
+                return None
+            names, patterns, pattern_lists, keys, targets, links, out = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    fail = array('I')
+    fail.frombytes(links)
+    goto = dict(zip(memoryview(keys).cast('Q'), memoryview(targets).cast('I')))
+    return Watchlist(names, patterns, pattern_lists, goto, fail, out)